@@ -1,6 +1,14 @@
 # client.py
 import socket
 import json
+import lzma
+import struct
+import zlib
+
+# Tramas de respuesta tras negociar compresión: 1 byte algoritmo + 4 bytes largo + carga
+CABECERA = struct.Struct("!BI")
+COMPRESORES = {"zlib": (1, zlib.compress), "lzma": (2, lzma.compress)}
+DESCOMPRESORES = {0: bytes, 1: zlib.decompress, 2: lzma.decompress}
 
 def enviar_request(request):
     client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -10,6 +18,34 @@ def enviar_request(request):
     client.close()
     return json.loads(respuesta.decode())
 
+def negociar_compresion(sock, algoritmos=("zlib", "lzma")):
+    """Pide compresión para la conexión; devuelve el algoritmo elegido o None"""
+    sock.send(json.dumps({"accion": "negociar_compresion", "algoritmos": list(algoritmos)}).encode())
+    return json.loads(sock.recv(4096).decode())["data"]["algoritmo"]
+
+def enviar_solicitud(sock, request, algoritmo=None, umbral=1024):
+    """Envía una solicitud como trama (después de negociar_compresion), comprimida si supera el umbral"""
+    carga = json.dumps(request).encode()
+    codigo = 0
+    if algoritmo in COMPRESORES and len(carga) > umbral:
+        codigo, comprimir = COMPRESORES[algoritmo]
+        carga = comprimir(carga)
+    sock.sendall(CABECERA.pack(codigo, len(carga)) + carga)
+
+def recibir_exacto(sock, largo):
+    datos = b""
+    while len(datos) < largo:
+        parte = sock.recv(largo - len(datos))
+        if not parte:
+            raise ConnectionError("Conexión cerrada")
+        datos += parte
+    return datos
+
+def recibir_respuesta(sock):
+    """Lee una respuesta en tramas (después de negociar_compresion)"""
+    codigo, largo = CABECERA.unpack(recibir_exacto(sock, CABECERA.size))
+    return json.loads(DESCOMPRESORES[codigo](recibir_exacto(sock, largo)).decode())
+
 def menu():
     while True:
         print("\nOpciones:")
@@ -0,0 +1,160 @@
+"""
+Agenda de misiones: ventanas de tiempo por satélite en un árbol de intervalos.
+Permite detectar solapamientos al registrar y listar las misiones activas
+en un instante o rango sin recorrer la tabla misiones.
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+def a_timestamp(fecha: str) -> float:
+    """Convierte una fecha ISO (con o sin hora) a segundos; las fechas sin zona se toman como UTC"""
+    dt = datetime.fromisoformat(fecha)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+def ventana_mision(inicio: Optional[str], fin: Optional[str], duracion) -> Tuple[Optional[str], Optional[str]]:
+    """Completa el fin de la ventana a partir de la duración (en días) si no se indicó"""
+    if not inicio:
+        return None, None
+    if not fin:
+        fin = (datetime.fromisoformat(inicio) + timedelta(days=float(duracion))).isoformat()
+    if a_timestamp(fin) <= a_timestamp(inicio):
+        raise ValueError("El fin de la misión debe ser posterior al inicio")
+    return inicio, fin
+
+class Nodo:
+    __slots__ = ("inicio", "fin", "mision_id", "prioridad", "izq", "der", "max_fin")
+
+    def __init__(self, inicio: float, fin: float, mision_id: int):
+        self.inicio = inicio
+        self.fin = fin
+        self.mision_id = mision_id
+        self.prioridad = random.random()
+        self.izq = None
+        self.der = None
+        self.max_fin = fin
+
+    def actualizar(self):
+        self.max_fin = max(self.fin,
+                           self.izq.max_fin if self.izq else self.fin,
+                           self.der.max_fin if self.der else self.fin)
+
+class IndiceIntervalos:
+    """Árbol de intervalos [inicio, fin): treap ordenado por inicio donde cada
+    nodo guarda el mayor fin de su subárbol.
+
+    Insertar cuesta O(log n) esperado y una consulta O(log n + k log n) para k
+    resultados, porque se descartan los subárboles cuyo mayor fin no llega a
+    la consulta, sin importar cuánto dure la misión más larga.
+    """
+
+    def __init__(self):
+        self.raiz = None
+        self.cantidad = 0
+
+    def __len__(self):
+        return self.cantidad
+
+    def agregar(self, inicio: float, fin: float, mision_id: int):
+        self.raiz = self._insertar(self.raiz, Nodo(inicio, fin, mision_id))
+        self.cantidad += 1
+
+    def _insertar(self, nodo: Optional[Nodo], nuevo: Nodo) -> Nodo:
+        if nodo is None:
+            return nuevo
+        if (nuevo.inicio, nuevo.mision_id) < (nodo.inicio, nodo.mision_id):
+            nodo.izq = self._insertar(nodo.izq, nuevo)
+            if nodo.izq.prioridad > nodo.prioridad:
+                nodo = self._rotar_derecha(nodo)
+        else:
+            nodo.der = self._insertar(nodo.der, nuevo)
+            if nodo.der.prioridad > nodo.prioridad:
+                nodo = self._rotar_izquierda(nodo)
+        nodo.actualizar()
+        return nodo
+
+    @staticmethod
+    def _rotar_derecha(nodo: Nodo) -> Nodo:
+        hijo = nodo.izq
+        nodo.izq, hijo.der = hijo.der, nodo
+        nodo.actualizar()
+        hijo.actualizar()
+        return hijo
+
+    @staticmethod
+    def _rotar_izquierda(nodo: Nodo) -> Nodo:
+        hijo = nodo.der
+        nodo.der, hijo.izq = hijo.izq, nodo
+        nodo.actualizar()
+        hijo.actualizar()
+        return hijo
+
+    def _recorrer(self, desde: float, hasta: float, incluir_hasta: bool) -> List[int]:
+        """Ids de los intervalos con inicio < hasta (o <= hasta) y fin > desde, ordenados por inicio"""
+        ids: List[int] = []
+        pendientes = []
+        nodo = self.raiz
+        while pendientes or nodo is not None:
+            # Bajar por la izquierda mientras el subárbol tenga algún fin posterior a desde
+            while nodo is not None and nodo.max_fin > desde:
+                pendientes.append(nodo)
+                nodo = nodo.izq
+            if not pendientes:
+                break
+            nodo = pendientes.pop()
+            if nodo.inicio > hasta or (nodo.inicio == hasta and not incluir_hasta):
+                # En orden por inicio: este nodo y los que siguen empiezan después de la consulta
+                break
+            if nodo.fin > desde:
+                ids.append(nodo.mision_id)
+            nodo = nodo.der
+        return ids
+
+    def solapados(self, inicio: float, fin: float) -> List[int]:
+        """Ids de los intervalos que se cruzan con [inicio, fin)"""
+        return self._recorrer(inicio, fin, False)
+
+    def activos_en(self, instante: float) -> List[int]:
+        """Ids de los intervalos que contienen el instante"""
+        return self._recorrer(instante, instante, True)
+
+class Agenda:
+    """Un IndiceIntervalos por satélite, cargado desde la tabla misiones"""
+
+    def __init__(self):
+        self.satelites: Dict[int, IndiceIntervalos] = {}
+
+    def cargar(self, cursor):
+        self.satelites.clear()
+        cursor.execute("SELECT id, satelite_id, inicio, fin FROM misiones WHERE inicio IS NOT NULL AND fin IS NOT NULL")
+        for mision_id, satelite_id, inicio, fin in cursor.fetchall():
+            self.agregar(satelite_id, mision_id, inicio, fin)
+
+    def agregar(self, satelite_id: int, mision_id: int, inicio: str, fin: str):
+        indice = self.satelites.setdefault(satelite_id, IndiceIntervalos())
+        indice.agregar(a_timestamp(inicio), a_timestamp(fin), mision_id)
+
+    def solapadas(self, satelite_id: int, inicio: str, fin: str) -> List[int]:
+        """Misiones del satélite cuya ventana se cruza con [inicio, fin)"""
+        indice = self.satelites.get(satelite_id)
+        if indice is None:
+            return []
+        return indice.solapados(a_timestamp(inicio), a_timestamp(fin))
+
+    def activas(self, desde: str, hasta: Optional[str] = None, satelite_id: Optional[int] = None) -> List[int]:
+        """Misiones activas en el instante desde, o en algún momento de [desde, hasta)"""
+        if satelite_id is not None:
+            indices = [self.satelites[satelite_id]] if satelite_id in self.satelites else []
+        else:
+            indices = list(self.satelites.values())
+
+        ids = []
+        for indice in indices:
+            if hasta is None:
+                ids.extend(indice.activos_en(a_timestamp(desde)))
+            else:
+                ids.extend(indice.solapados(a_timestamp(desde), a_timestamp(hasta)))
+        return sorted(ids)
@@ -0,0 +1,141 @@
+"""
+Análisis de la telemetría numérica guardada en la tabla datos.
+Carga los valores por bloques en buffers array('d') y calcula los agregados
+con NumPy; si NumPy no está instalado usa Python puro con el mismo resultado.
+"""
+
+import math
+from array import array
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MOTOR = "numpy" if np is not None else "python"
+
+# Caracteres de la fecha ISO que definen cada intervalo de agrupación
+INTERVALOS = {"mes": 7, "dia": 10, "hora": 13, "minuto": 16}
+
+class Serie:
+    """Valores numéricos de un grupo (satélite, tipo, intervalo) y sus ids de fila"""
+
+    def __init__(self):
+        self.valores = array('d')
+        self.ids = array('q')
+
+def cargar_series(cursor, satelite_ids: Optional[List[int]] = None, tipos: Optional[List[str]] = None,
+                  intervalo: Optional[str] = None, tam_bloque: int = 5000) -> Dict[tuple, Serie]:
+    """Lee las filas por bloques y agrupa los valores numéricos; los no numéricos se ignoran"""
+    condiciones, parametros = [], []
+    if satelite_ids is not None:
+        condiciones.append(f"satelite_id IN ({','.join('?' * len(satelite_ids))})")
+        parametros.extend(satelite_ids)
+    if tipos is not None:
+        condiciones.append(f"tipo IN ({','.join('?' * len(tipos))})")
+        parametros.extend(tipos)
+    consulta = "SELECT id, satelite_id, tipo, valor, fecha FROM datos"
+    if condiciones:
+        consulta += " WHERE " + " AND ".join(condiciones)
+    largo = INTERVALOS.get(intervalo)
+
+    series: Dict[tuple, Serie] = {}
+    cursor.execute(consulta, parametros)
+    while True:
+        filas = cursor.fetchmany(tam_bloque)
+        if not filas:
+            break
+        for dato_id, satelite_id, tipo, valor, fecha in filas:
+            try:
+                numero = float(valor)
+            except (TypeError, ValueError):
+                continue
+            if not math.isfinite(numero):
+                continue
+            grupo = (satelite_id, tipo, (fecha or "")[:largo] if largo else None)
+            serie = series.get(grupo)
+            if serie is None:
+                serie = series[grupo] = Serie()
+            serie.valores.append(numero)
+            serie.ids.append(dato_id)
+    return series
+
+def percentil(ordenados: List[float], p: float) -> float:
+    """Percentil con interpolación lineal, igual que numpy.percentile"""
+    k = (len(ordenados) - 1) * p / 100
+    piso, techo = math.floor(k), math.ceil(k)
+    return ordenados[piso] + (ordenados[techo] - ordenados[piso]) * (k - piso)
+
+def resumir(serie: Serie, percentiles: List[float], umbral_z: float, max_anomalias: int) -> Dict:
+    """Media, mínimo, máximo, desviación estándar, percentiles y filas con |z| > umbral_z"""
+    if np is not None:
+        valores = np.frombuffer(serie.valores, dtype=np.float64)
+        media, desviacion = float(valores.mean()), float(valores.std())
+        resumen = {
+            "n": int(valores.size),
+            "media": media,
+            "min": float(valores.min()),
+            "max": float(valores.max()),
+            "desviacion": desviacion,
+            "percentiles": {str(p): float(v) for p, v in zip(percentiles, np.percentile(valores, percentiles))},
+            "anomalias": [],
+        }
+        if desviacion > 0:
+            fuera = np.abs(valores - media) > umbral_z * desviacion
+            ids = np.frombuffer(serie.ids, dtype=np.int64)
+            resumen["anomalias"] = ids[fuera][:max_anomalias].tolist()
+        return resumen
+
+    valores = serie.valores
+    n = len(valores)
+    media = math.fsum(valores) / n
+    desviacion = math.sqrt(math.fsum((v - media) ** 2 for v in valores) / n)
+    ordenados = sorted(valores)
+    anomalias = []
+    if desviacion > 0:
+        limite = umbral_z * desviacion
+        anomalias = [i for v, i in zip(valores, serie.ids) if abs(v - media) > limite][:max_anomalias]
+    return {
+        "n": n,
+        "media": media,
+        "min": ordenados[0],
+        "max": ordenados[-1],
+        "desviacion": desviacion,
+        "percentiles": {str(p): percentil(ordenados, p) for p in percentiles},
+        "anomalias": anomalias,
+    }
+
+def validar_textos(valores, campo: str) -> Optional[List[str]]:
+    """None, o una lista de textos; un texto suelto se toma como lista de uno. Lanza ValueError si no"""
+    if valores is None:
+        return None
+    if isinstance(valores, str):
+        return [valores]
+    if not isinstance(valores, (list, tuple)) or not all(isinstance(v, str) for v in valores):
+        raise ValueError(f"'{campo}' debe ser un texto o una lista de textos")
+    return list(valores)
+
+def validar_percentiles(percentiles) -> List[float]:
+    """Lista de percentiles entre 0 y 100; lanza ValueError si alguno no lo es"""
+    if isinstance(percentiles, (int, float)):
+        percentiles = [percentiles]
+    if not isinstance(percentiles, (list, tuple)):
+        raise ValueError("Los percentiles deben ser una lista de números entre 0 y 100")
+    for p in percentiles:
+        if isinstance(p, bool) or not isinstance(p, (int, float)):
+            raise ValueError(f"Percentil no numérico: {p!r}")
+        if not 0 <= p <= 100:
+            raise ValueError(f"Percentil fuera de rango (0 a 100): {p}")
+    return list(percentiles)
+
+def analizar(series: Dict[tuple, Serie], percentiles: List[float] = (50, 90, 99),
+             umbral_z: float = 3.0, max_anomalias: int = 100) -> List[Dict]:
+    """Agregados por grupo, ordenados por satélite, tipo e intervalo"""
+    percentiles = validar_percentiles(percentiles)
+    resultados = []
+    for (satelite_id, tipo, intervalo), serie in sorted(series.items(), key=lambda item: tuple(str(v) for v in item[0])):
+        resumen = resumir(serie, percentiles, umbral_z, max_anomalias)
+        resumen.update({"satelite_id": satelite_id, "tipo": tipo, "intervalo": intervalo})
+        resultados.append(resumen)
+    return resultados
@@ -0,0 +1,170 @@
+"""
+Búsqueda de texto sobre el objetivo y el nombre de la zona de las misiones y
+sobre el nombre y tipo de los satélites. Usa tablas FTS5 de SQLite
+sincronizadas con triggers y, si FTS5 no está compilado, un índice invertido
+en memoria.
+"""
+
+import bisect
+import math
+import re
+import sqlite3
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# Campos indexados por tipo de documento: (tabla, columna de título, columnas de texto).
+# De la zona solo se indexa el nombre: el JSON con bbox o polígono no es texto buscable.
+DOCUMENTOS = {
+    "mision": ("misiones", "objetivo", ("objetivo", "zona_nombre")),
+    "satelite": ("satelites", "nombre", ("nombre", "tipo")),
+}
+
+def normalizar(texto: str) -> str:
+    """Minúsculas y sin tildes, igual que el tokenizador unicode61 de FTS5"""
+    texto = unicodedata.normalize("NFKD", str(texto or "").lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+def tokenizar(texto: str) -> List[str]:
+    return re.findall(r"\w+", normalizar(texto))
+
+def consulta_fts(texto: str) -> str:
+    """Convierte las palabras del usuario en una consulta FTS5 segura (AND de prefijos)"""
+    return " ".join('"' + token + '"*' for token in tokenizar(texto))
+
+class IndiceInvertido:
+    """Índice invertido en memoria con vocabulario ordenado para buscar por prefijo"""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[Tuple[str, int], int]] = defaultdict(dict)
+        self.vocabulario: List[str] = []
+        self.documentos: Dict[Tuple[str, int], Tuple[str, str]] = {}
+
+    def agregar(self, tipo: str, doc_id: int, titulo: str, texto: str):
+        clave = (tipo, doc_id)
+        self.documentos[clave] = (titulo, texto)
+        for token in tokenizar(texto):
+            if token not in self.postings:
+                bisect.insort(self.vocabulario, token)
+            self.postings[token][clave] = self.postings[token].get(clave, 0) + 1
+
+    def _prefijo(self, prefijo: str) -> Dict[Tuple[str, int], int]:
+        frecuencias: Dict[Tuple[str, int], int] = defaultdict(int)
+        pos = bisect.bisect_left(self.vocabulario, prefijo)
+        while pos < len(self.vocabulario) and self.vocabulario[pos].startswith(prefijo):
+            for clave, tf in self.postings[self.vocabulario[pos]].items():
+                frecuencias[clave] += tf
+            pos += 1
+        return frecuencias
+
+    def buscar(self, texto: str, tipos, limite: int, desplazamiento: int) -> List[list]:
+        tokens = tokenizar(texto)
+        if not tokens:
+            return []
+        puntajes = None
+        for token in tokens:
+            frecuencias = {k: tf for k, tf in self._prefijo(token).items() if k[0] in tipos}
+            idf = math.log(1 + len(self.documentos) / (1 + len(frecuencias)))
+            parciales = {k: tf * idf for k, tf in frecuencias.items()}
+            if puntajes is None:
+                puntajes = parciales
+            else:
+                puntajes = {k: v + parciales[k] for k, v in puntajes.items() if k in parciales}
+
+        # Negativo para ordenar igual que bm25/rank de FTS5 (menor es mejor)
+        orden = sorted(puntajes.items(), key=lambda item: (-item[1], item[0]))
+        return [
+            [tipo, doc_id, self.documentos[(tipo, doc_id)][0],
+             self.fragmento(self.documentos[(tipo, doc_id)][1], tokens), -puntaje]
+            for (tipo, doc_id), puntaje in orden[desplazamiento:desplazamiento + limite]
+        ]
+
+    @staticmethod
+    def fragmento(texto: str, tokens: List[str], ventana: int = 10) -> str:
+        """Recorta el texto alrededor de la primera coincidencia y la marca con [ ]"""
+        palabras = texto.split()
+        coincide = [any(w.startswith(t) for w in tokenizar(p) for t in tokens) for p in palabras]
+        primera = coincide.index(True) if True in coincide else 0
+        desde = max(0, primera - ventana // 2)
+        partes = [f"[{p}]" if coincide[i] else p for i, p in enumerate(palabras[desde:desde + ventana], desde)]
+        return ("..." if desde > 0 else "") + " ".join(partes) + ("..." if desde + ventana < len(palabras) else "")
+
+class Buscador:
+    """Búsqueda sobre FTS5, o sobre IndiceInvertido como respaldo"""
+
+    def __init__(self):
+        self.indice = None
+
+    def inicializar(self, cursor):
+        try:
+            for tabla, _, campos in DOCUMENTOS.values():
+                self._crear_fts(cursor, tabla, campos)
+        except sqlite3.OperationalError:
+            self.indice = IndiceInvertido()
+            for tipo, (tabla, titulo, campos) in DOCUMENTOS.items():
+                cursor.execute(f"SELECT id, {titulo}, {', '.join(campos)} FROM {tabla}")
+                for fila in cursor.fetchall():
+                    self.indice.agregar(tipo, fila[0], fila[1] or "", " ".join(str(v or "") for v in fila[2:]))
+
+    @staticmethod
+    def _crear_fts(cursor, tabla, campos):
+        fts = f"{tabla}_fts"
+        columnas = ", ".join(campos)
+        nuevos = ", ".join(f"new.{c}" for c in campos)
+        viejos = ", ".join(f"old.{c}" for c in campos)
+        existe = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts,)).fetchone()
+        if existe and [fila[1] for fila in cursor.execute(f"PRAGMA table_info({fts})")] != list(campos):
+            # Índice creado con otras columnas: se rehace desde cero
+            for sufijo in ("ai", "ad", "au"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {fts}_{sufijo}")
+            cursor.execute(f"DROP TABLE {fts}")
+            existe = None
+
+        cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columnas}, content='{tabla}', content_rowid='id')")
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabla} BEGIN
+                INSERT INTO {fts}(rowid, {columnas}) VALUES (new.id, {nuevos});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabla} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {columnas}) VALUES ('delete', old.id, {viejos});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {tabla} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {columnas}) VALUES ('delete', old.id, {viejos});
+                INSERT INTO {fts}(rowid, {columnas}) VALUES (new.id, {nuevos});
+            END
+        ''')
+        if not existe:
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+    def agregar(self, tipo: str, doc_id: int, *valores):
+        """Indexa un documento nuevo; con FTS5 lo hacen los triggers"""
+        if self.indice is not None:
+            self.indice.agregar(tipo, doc_id, str(valores[0] or ""), " ".join(str(v or "") for v in valores))
+
+    def buscar(self, cursor, texto: str, tipos=None, limite: int = 20, desplazamiento: int = 0) -> List[list]:
+        """Filas [tipo, id, título, fragmento, rank] ordenadas por relevancia"""
+        if isinstance(tipos, str):
+            tipos = [tipos]
+        tipos = [t for t in (tipos or DOCUMENTOS) if t in DOCUMENTOS]
+        if self.indice is not None:
+            return self.indice.buscar(texto, tipos, limite, desplazamiento)
+
+        consulta = consulta_fts(texto)
+        if not consulta or not tipos:
+            return []
+        selects, parametros = [], []
+        for tipo in tipos:
+            tabla, titulo, _ = DOCUMENTOS[tipo]
+            fts = f"{tabla}_fts"
+            selects.append(
+                f"SELECT '{tipo}', rowid, {titulo}, snippet({fts}, -1, '[', ']', '...', 10), rank "
+                f"FROM {fts} WHERE {fts} MATCH ?"
+            )
+            parametros.append(consulta)
+        cursor.execute(" UNION ALL ".join(selects) + " ORDER BY 5, 1, 2 LIMIT ? OFFSET ?",
+                       parametros + [limite, desplazamiento])
+        return [list(fila) for fila in cursor.fetchall()]
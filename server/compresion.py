@@ -0,0 +1,128 @@
+"""
+Compresión de respuestas y de la columna valor, solo con la biblioteca estándar.
+
+Una conexión que negocia compresión intercambia desde entonces solicitudes y
+respuestas como tramas: 1 byte con el algoritmo (0 sin comprimir, 1 zlib,
+2 lzma), 4 bytes con el largo y la carga. Así una solicitud puede superar el
+tamaño de un recv. Solo se comprimen las cargas que superan el umbral; el
+lado del cliente está en client/client.py (enviar_solicitud, recibir_respuesta).
+
+Los valores grandes de la tabla datos se guardan como BLOB zlib con un prefijo
+que los distingue del texto plano, y se descomprimen al leerlos.
+"""
+
+import lzma
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+CABECERA = struct.Struct("!BI")
+ALGORITMOS = {
+    "zlib": (1, lambda datos: zlib.compress(datos, 6)),
+    "lzma": (2, lambda datos: lzma.compress(datos, preset=1)),
+}
+MAX_TRAMA = 16 * 1024 * 1024  # bytes de una solicitud, antes y después de descomprimir
+
+PREFIJO_VALOR = b"\x00zv1"
+
+class EstadisticasCompresion:
+    """Bytes antes y después y tiempo de CPU de compresión, por acción"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.acciones: Dict[str, Dict[str, float]] = {}
+
+    def registrar(self, accion: str, original: int, comprimido: int, cpu: float):
+        with self.lock:
+            datos = self.acciones.setdefault(accion, {"veces": 0, "bytes_originales": 0,
+                                                      "bytes_comprimidos": 0, "cpu_segundos": 0.0})
+            datos["veces"] += 1
+            datos["bytes_originales"] += original
+            datos["bytes_comprimidos"] += comprimido
+            datos["cpu_segundos"] += cpu
+
+    def metricas(self) -> Dict[str, Dict[str, float]]:
+        with self.lock:
+            return {
+                accion: dict(datos, ratio=datos["bytes_originales"] / max(datos["bytes_comprimidos"], 1))
+                for accion, datos in self.acciones.items()
+            }
+
+ESTADISTICAS = EstadisticasCompresion()
+
+def elegir_algoritmo(pedidos) -> Optional[str]:
+    """Primer algoritmo de la lista del cliente que el servidor soporta"""
+    for algoritmo in pedidos or []:
+        if algoritmo in ALGORITMOS:
+            return algoritmo
+    return None
+
+def empaquetar(carga: bytes, algoritmo: str, umbral: int, accion: str = "") -> bytes:
+    """Arma la trama de una respuesta, comprimida si supera el umbral"""
+    if len(carga) <= umbral:
+        return CABECERA.pack(0, len(carga)) + carga
+    codigo, comprimir = ALGORITMOS[algoritmo]
+    inicio = time.thread_time()
+    comprimida = comprimir(carga)
+    ESTADISTICAS.registrar(accion, len(carga), len(comprimida), time.thread_time() - inicio)
+    return CABECERA.pack(codigo, len(comprimida)) + comprimida
+
+def recibir_exacto(sock, largo: int) -> bytes:
+    partes = []
+    while largo:
+        parte = sock.recv(min(largo, 65536))
+        if not parte:
+            raise ConnectionError("Conexión cerrada a mitad de una trama")
+        partes.append(parte)
+        largo -= len(parte)
+    return b"".join(partes)
+
+def descomprimir_trama(codigo: int, carga: bytes, maximo: int) -> bytes:
+    """Descomprime sin pasar de `maximo` bytes, para no inflar una carga maliciosa sin límite"""
+    if codigo == 0:
+        return carga
+    if codigo == 1:
+        descompresor = zlib.decompressobj()
+        datos = descompresor.decompress(carga, maximo)
+        completo = descompresor.eof and not descompresor.unconsumed_tail
+    elif codigo == 2:
+        descompresor = lzma.LZMADecompressor()
+        datos = descompresor.decompress(carga, maximo)
+        completo = descompresor.eof
+    else:
+        raise ValueError(f"Algoritmo de trama desconocido: {codigo}")
+    if not completo:
+        raise ValueError(f"La solicitud supera {maximo} bytes o está truncada")
+    return datos
+
+def recibir_trama(sock, maximo: int = MAX_TRAMA) -> Optional[bytes]:
+    """Lee una trama del socket y devuelve la carga descomprimida; None si el cliente cerró"""
+    primero = sock.recv(1)
+    if not primero:
+        return None
+    codigo, largo = CABECERA.unpack(primero + recibir_exacto(sock, CABECERA.size - 1))
+    if largo > maximo:
+        raise ValueError(f"La solicitud supera {maximo} bytes")
+    return descomprimir_trama(codigo, recibir_exacto(sock, largo), maximo)
+
+def comprimir_valor(valor, umbral: int, accion: str = "registrar_dato"):
+    """Devuelve el valor tal cual o, si supera el umbral, como BLOB zlib con prefijo"""
+    if not umbral or not isinstance(valor, str):
+        return valor
+    datos = valor.encode("utf-8")
+    if len(datos) <= umbral:
+        return valor
+    inicio = time.thread_time()
+    comprimido = PREFIJO_VALOR + zlib.compress(datos, 6)
+    ESTADISTICAS.registrar(accion, len(datos), len(comprimido), time.thread_time() - inicio)
+    if len(comprimido) >= len(datos):
+        return valor
+    return comprimido
+
+def descomprimir_valor(valor):
+    """Inverso de comprimir_valor; el texto sin comprimir pasa sin cambios"""
+    if isinstance(valor, bytes) and valor.startswith(PREFIJO_VALOR):
+        return zlib.decompress(valor[len(PREFIJO_VALOR):]).decode("utf-8")
+    return valor
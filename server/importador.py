@@ -0,0 +1,392 @@
+"""
+Importador masivo: consolida las bases SQLite y los archivos JSON dispersos
+en el esquema vivo del servidor.
+
+Cada fuente se lee fila por fila, se normaliza a los modelos, se descartan
+los duplicados (satélites por nombre o id, misiones y datos por contenido) y
+se carga con executemany en transacciones grandes, con los índices
+secundarios desactivados hasta el final.
+
+Uso:
+    python server/importador.py [--destino sistema_satelites.db] [fuente ...]
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+import server
+from agenda import ventana_mision
+from compresion import comprimir_valor, descomprimir_valor
+from models import (DatosRecolectados, Mision, Satelite, Sensor, ZonaObservacion, normalizar_tipo_sensor,
+                    sensores_desde_texto)
+
+FUENTES_POR_DEFECTO = [
+    "sistema_satelites.db",
+    "satelites.db",
+    "server/sistema_espacial.db",
+    "database/satellites.db",
+    "data.json",
+    "server/backup.json",
+    "server/satellites.json",
+]
+
+# Tablas de origen y la entidad que contienen, en orden de carga
+TABLAS = {
+    "satelites": "satelite", "satellites": "satelite",
+    "sensores": "sensor",
+    "misiones": "mision", "missions": "mision",
+    "datos": "dato", "data": "dato", "datos_recolectados": "dato", "sensor_data": "dato",
+}
+ORDEN = ("satelite", "sensor", "mision", "dato")
+
+# Nombres de columna aceptados para cada campo normalizado
+CAMPOS = {
+    "satelite": {
+        "id": ("id",), "nombre": ("nombre", "name"), "tipo": ("tipo", "type"),
+        "sensores": ("sensores", "sensors", "sensores_json"),
+        "fecha_lanzamiento": ("fecha_lanzamiento", "launch_date"),
+        "orbita": ("orbita", "orbit"), "estado": ("estado", "status"),
+    },
+    "sensor": {
+        "satelite_id": ("satelite_id", "satellite_id"), "nombre": ("nombre", "name"),
+        "tipo": ("tipo", "type"), "descripcion": ("descripcion",),
+    },
+    "mision": {
+        "satelite_nombre": ("satelite_nombre", "satelite", "satellite"),
+        "satelite_id": ("satelite_id", "satellite_id"),
+        "objetivo": ("objetivo", "objective", "mission_name"),
+        "zona": ("zona", "zona_observacion"), "duracion": ("duracion",),
+        "estado": ("estado", "status"), "inicio": ("inicio", "start_date"), "fin": ("fin", "end_date"),
+    },
+    "dato": {
+        "satelite_nombre": ("satelite_nombre", "satelite", "satellite"),
+        "satelite_id": ("satelite_id", "satellite_id"),
+        "tipo": ("tipo", "tipo_dato", "sensor_name"),
+        "valor": ("valor", "datos", "contenido", "value"), "fecha": ("fecha", "timestamp"),
+    },
+}
+
+# Orden de las columnas en los volcados posicionales (backup.json del servidor)
+POSICIONES = {
+    "satelite": ("id", "nombre", "tipo", "sensores", "fecha_lanzamiento", "orbita", "estado"),
+    "mision": ("id", "satelite_nombre", "objetivo", "zona", "duracion", "estado", "inicio", "fin"),
+    "dato": ("id", "satelite_nombre", "tipo", "valor", "fecha"),
+}
+
+def campo(fila: Dict, entidad: str, nombre: str, defecto=None):
+    for alias in CAMPOS[entidad][nombre]:
+        if fila.get(alias) is not None:
+            return fila[alias]
+    return defecto
+
+# ---------------------------------------------------------------- lectura
+
+def leer_sqlite(ruta: str, tam_bloque: int) -> Iterator[Tuple[str, Dict]]:
+    conn = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+    try:
+        tablas = [t for (t,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'") if t in TABLAS]
+        for tabla in sorted(tablas, key=lambda t: ORDEN.index(TABLAS[t])):
+            cursor = conn.execute(f'SELECT * FROM "{tabla}"')
+            nombres = [d[0] for d in cursor.description]
+            while True:
+                filas = cursor.fetchmany(tam_bloque)
+                if not filas:
+                    break
+                for fila in filas:
+                    yield TABLAS[tabla], dict(zip(nombres, fila))
+    finally:
+        conn.close()
+
+def entidad_de_fila(fila: Dict, ruta: str) -> str:
+    nombre = os.path.basename(ruta).lower()
+    for prefijo, entidad in (("satel", "satelite"), ("mision", "mision"), ("dato", "dato")):
+        if nombre.startswith(prefijo):
+            return entidad
+    if "orbita" in fila or "orbit" in fila:
+        return "satelite"
+    return "mision" if "objetivo" in fila else "dato"
+
+def normalizar_fila(entidad: Optional[str], fila, ruta: str) -> Tuple[str, Dict]:
+    """Convierte una fila de JSON (diccionario o lista posicional) a diccionario con su entidad.
+
+    Lanza KeyError o TypeError si la fila no se puede interpretar; el
+    importador la cuenta como descartada.
+    """
+    if isinstance(fila, list):
+        fila = dict(zip(POSICIONES[entidad], fila))
+    if not isinstance(fila, dict):
+        raise TypeError(f"Fila no reconocida: {fila!r}")
+    return entidad or entidad_de_fila(fila, ruta), fila
+
+def leer_json(ruta: str) -> Iterator[Tuple[Optional[str], object]]:
+    """Filas del documento sin normalizar; la entidad es None si el archivo no la indica"""
+    # json no permite lectura incremental: se carga el documento y se recorre fila por fila
+    with open(ruta, encoding="utf-8") as f:
+        documento = json.load(f)
+
+    if isinstance(documento, dict):
+        secciones = [(TABLAS.get(clave), filas) for clave, filas in documento.items() if clave in TABLAS]
+    elif documento and all(isinstance(d, dict) and "stmt" in d for d in documento):
+        # Exportaciones de consultas: [{"stmt": "SELECT * FROM tabla;", "header": [...], "rows": [...]}]
+        secciones = []
+        for exportacion in documento:
+            tabla = re.search(r"FROM\s+(\w+)", exportacion["stmt"], re.IGNORECASE)
+            if tabla and tabla.group(1) in TABLAS:
+                filas = [dict(zip(exportacion["header"], fila)) for fila in exportacion["rows"]]
+                secciones.append((TABLAS[tabla.group(1)], filas))
+    else:
+        secciones = [(None, documento)]
+
+    for entidad, filas in sorted(secciones, key=lambda s: ORDEN.index(s[0]) if s[0] else 0):
+        for fila in (filas if isinstance(filas, list) else [filas]):
+            yield entidad, fila
+
+def leer_fuente(ruta: str, tam_bloque: int) -> Iterator[Tuple[Optional[str], object]]:
+    if ruta.endswith(".json"):
+        return leer_json(ruta)
+    return leer_sqlite(ruta, tam_bloque)
+
+# ---------------------------------------------------------------- carga
+
+class Importador:
+    """Normaliza filas de distintas fuentes y las carga por lotes en la base destino"""
+
+    def __init__(self, destino: str, tam_lote: int = 10000):
+        self.destino = destino
+        self.tam_lote = tam_lote
+        self.conn = None
+        self.cursor = None
+        self.nombres: Dict[str, int] = {}
+        self.uuids: Dict[str, str] = {}  # ids de texto (UUID), únicos entre fuentes -> nombre
+        self.vistos = set()  # hash del contenido de sensores, misiones y datos ya cargados
+        self.lotes = {entidad: [] for entidad in ORDEN}
+        self.siguiente_id = 1
+
+    def abrir(self):
+        server.DB_FILE = self.destino
+        server.init_db()
+        self.conn = sqlite3.connect(self.destino)
+        self.cursor = self.conn.cursor()
+        self.cursor.execute("PRAGMA synchronous = OFF")
+        self.desactivar_indices()
+
+        for satelite_id, nombre in self.cursor.execute("SELECT id, nombre FROM satelites").fetchall():
+            self.nombres[nombre] = satelite_id
+        self.siguiente_id = max(self.nombres.values(), default=0) + 1
+        for satelite_id, nombre in self.cursor.execute("SELECT satelite_id, nombre FROM sensores"):
+            self.vistos.add(hash(("sensor", satelite_id, nombre)))
+        for fila in self.cursor.execute("SELECT satelite_id, objetivo, zona, duracion, estado, inicio, fin FROM misiones"):
+            self.vistos.add(hash(("mision",) + tuple(str(v) for v in fila)))
+        for satelite_id, tipo, valor, fecha in self.cursor.execute("SELECT satelite_id, tipo, valor, fecha FROM datos"):
+            valores = (satelite_id, tipo, descomprimir_valor(valor), fecha)
+            self.vistos.add(hash(("dato",) + tuple(str(v) for v in valores)))
+
+    def desactivar_indices(self):
+        """Quita índices secundarios, triggers y tablas FTS; init_db los rehace al cerrar"""
+        objetos = self.cursor.execute(
+            "SELECT type, name FROM sqlite_master WHERE (type = 'index' AND name LIKE 'idx_%') OR type = 'trigger'"
+        ).fetchall()
+        for tipo, nombre in objetos:
+            self.cursor.execute(f'DROP {tipo.upper()} "{nombre}"')
+        for tabla in ("misiones_fts", "satelites_fts"):
+            self.cursor.execute(f"DROP TABLE IF EXISTS {tabla}")
+        self.conn.commit()
+
+    def cerrar(self):
+        """Vuelca lo pendiente y rehace índices, triggers y tablas FTS aunque el volcado falle"""
+        try:
+            for entidad in ORDEN:
+                self.volcar(entidad)
+            self.conn.commit()
+        finally:
+            self.conn.close()
+            server.init_db()
+
+    def volcar(self, entidad: str):
+        lote = self.lotes[entidad]
+        if not lote:
+            return
+        try:
+            if entidad == "satelite":
+                self.cursor.executemany(
+                    "INSERT INTO satelites (id,nombre,tipo,sensores,fecha_lanzamiento,orbita,estado) VALUES (?,?,?,?,?,?,?)", lote)
+            elif entidad == "sensor":
+                self.cursor.executemany(
+                    "INSERT INTO sensores (satelite_id,nombre,tipo,descripcion) VALUES (?,?,?,?)", lote)
+            elif entidad == "mision":
+                self.cursor.executemany(
+                    "INSERT INTO misiones (satelite_id,objetivo,zona,duracion,estado,inicio,fin,zona_nombre) VALUES (?,?,?,?,?,?,?,?)",
+                    lote)
+            else:
+                self.cursor.executemany(
+                    "INSERT INTO datos (satelite_id,tipo,valor,fecha) VALUES (?,?,?,?)", lote)
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        finally:
+            # Un lote que falla se descarta para no repetir el error al cerrar
+            lote.clear()
+
+    def agregar(self, entidad: str, fila: tuple):
+        self.lotes[entidad].append(fila)
+        if len(self.lotes[entidad]) >= self.tam_lote:
+            # Los satélites van antes para que las referencias ya existan
+            if entidad != "satelite":
+                self.volcar("satelite")
+            self.volcar(entidad)
+
+    def importar(self, ruta: str, tam_bloque: int = 5000, cada: int = 50000) -> Dict[str, int]:
+        """Importa una fuente y devuelve el conteo de filas por resultado"""
+        conteo = {"leidas": 0, "importadas": 0, "duplicadas": 0, "descartadas": 0}
+        ids_fuente: Dict[object, str] = {}  # id en la fuente -> nombre del satélite
+        inicio = time.perf_counter()
+
+        for entidad, fila in leer_fuente(ruta, tam_bloque):
+            conteo["leidas"] += 1
+            try:
+                entidad, fila = normalizar_fila(entidad, fila, ruta)
+                resultado = getattr(self, f"importar_{entidad}")(fila, ids_fuente)
+            except (AttributeError, KeyError, TypeError, ValueError):
+                resultado = "descartadas"
+            conteo[resultado] += 1
+            if conteo["leidas"] % cada == 0:
+                transcurrido = time.perf_counter() - inicio
+                print(f"  {ruta}: {conteo['leidas']} filas ({conteo['leidas'] / transcurrido:.0f} filas/s)")
+
+        for entidad in ORDEN:
+            self.volcar(entidad)
+        conteo["segundos"] = time.perf_counter() - inicio
+        return conteo
+
+    def nombre_por_id(self, ids_fuente: Dict, satelite_id) -> str:
+        if isinstance(satelite_id, str) and satelite_id in self.uuids:
+            return self.uuids[satelite_id]
+        return ids_fuente[satelite_id]
+
+    def resolver(self, entidad: str, fila: Dict, ids_fuente: Dict) -> int:
+        nombre = campo(fila, entidad, "satelite_nombre")
+        if nombre is None:
+            nombre = self.nombre_por_id(ids_fuente, campo(fila, entidad, "satelite_id"))
+        return self.nombres[nombre]
+
+    def importar_satelite(self, fila: Dict, ids_fuente: Dict) -> str:
+        nombre = campo(fila, "satelite", "nombre")
+        if nombre is None or not str(nombre).strip():
+            return "descartadas"
+        satelite = Satelite(
+            nombre=str(nombre).strip(),
+            tipo=campo(fila, "satelite", "tipo", ""),
+            fecha_lanzamiento=campo(fila, "satelite", "fecha_lanzamiento", ""),
+            orbita=campo(fila, "satelite", "orbita", ""),
+            estado=campo(fila, "satelite", "estado", "activo"),
+            sensores=sensores_desde_texto(campo(fila, "satelite", "sensores")),
+        )
+        fuente_id = campo(fila, "satelite", "id")
+        if isinstance(fuente_id, str) and fuente_id in self.uuids:
+            return "duplicadas"
+        ids_fuente[fuente_id] = satelite.nombre
+        if isinstance(fuente_id, str):
+            self.uuids[fuente_id] = satelite.nombre
+        if satelite.nombre in self.nombres:
+            return "duplicadas"
+
+        self.nombres[satelite.nombre] = self.siguiente_id
+        sensores = json.dumps([sensor.to_dict() for sensor in satelite.sensores], ensure_ascii=False)
+        self.agregar("satelite", (self.siguiente_id, satelite.nombre, satelite.tipo, sensores,
+                                  satelite.fecha_lanzamiento, satelite.orbita, satelite.estado))
+        self.siguiente_id += 1
+        return "importadas"
+
+    def importar_sensor(self, fila: Dict, ids_fuente: Dict) -> str:
+        satelite_id = self.nombres[self.nombre_por_id(ids_fuente, campo(fila, "sensor", "satelite_id"))]
+        nombre = campo(fila, "sensor", "nombre")
+        sensor = Sensor(nombre, normalizar_tipo_sensor(campo(fila, "sensor", "tipo"), str(nombre)),
+                        campo(fila, "sensor", "descripcion", ""))
+        clave = hash(("sensor", satelite_id, sensor.nombre))
+        if clave in self.vistos:
+            return "duplicadas"
+        self.vistos.add(clave)
+        self.agregar("sensor", (satelite_id, sensor.nombre, sensor.tipo, sensor.descripcion))
+        return "importadas"
+
+    def importar_mision(self, fila: Dict, ids_fuente: Dict) -> str:
+        satelite_id = self.resolver("mision", fila, ids_fuente)
+        mision = Mision(
+            satelite_id=satelite_id,
+            objetivo=campo(fila, "mision", "objetivo", ""),
+            zona_observacion=ZonaObservacion.from_valor(campo(fila, "mision", "zona", "")).validar(),
+            duracion=campo(fila, "mision", "duracion", ""),
+            estado=campo(fila, "mision", "estado", "planificada"),
+        )
+        try:
+            mision.inicio, mision.fin = ventana_mision(campo(fila, "mision", "inicio"), campo(fila, "mision", "fin"),
+                                                       mision.duracion)
+        except (TypeError, ValueError):
+            mision.inicio, mision.fin = None, None
+
+        # La ventana es parte de la clave: la misma misión en otra fecha no es un duplicado
+        valores = (satelite_id, mision.objetivo, str(mision.zona_observacion), mision.duracion, mision.estado,
+                   mision.inicio, mision.fin)
+        clave = hash(("mision",) + tuple(str(v) for v in valores))
+        if clave in self.vistos:
+            return "duplicadas"
+        self.vistos.add(clave)
+        self.agregar("mision", valores + (mision.zona_observacion.nombre,))
+        return "importadas"
+
+    def importar_dato(self, fila: Dict, ids_fuente: Dict) -> str:
+        satelite_id = self.resolver("dato", fila, ids_fuente)
+        valor = descomprimir_valor(campo(fila, "dato", "valor", ""))
+        if not isinstance(valor, str):
+            # Los JSON pueden traer números, listas u objetos; se guardan como texto JSON
+            valor = json.dumps(valor, ensure_ascii=False)
+        dato = DatosRecolectados(satelite_id, campo(fila, "dato", "tipo", ""), valor)
+        # Sin fecha en la fuente queda NULL: la hora actual cambiaría la clave en cada corrida
+        dato.fecha = campo(fila, "dato", "fecha")
+
+        valores = (satelite_id, dato.tipo, dato.datos, dato.fecha)
+        clave = hash(("dato",) + tuple(str(v) for v in valores))
+        if clave in self.vistos:
+            return "duplicadas"
+        self.vistos.add(clave)
+        self.agregar("dato", valores[:2] + (comprimir_valor(dato.datos, server.VALOR_COMPRESION_UMBRAL),) + valores[3:])
+        return "importadas"
+
+def main():
+    parser = argparse.ArgumentParser(description="Consolida bases y archivos JSON en el esquema del servidor")
+    parser.add_argument("fuentes", nargs="*", default=FUENTES_POR_DEFECTO)
+    parser.add_argument("--destino", default=server.DB_FILE)
+    parser.add_argument("--lote", type=int, default=10000, help="filas por executemany")
+    args = parser.parse_args()
+
+    importador = Importador(args.destino, args.lote)
+    importador.abrir()
+    total, inicio = 0, time.perf_counter()
+    try:
+        for ruta in args.fuentes:
+            if not os.path.exists(ruta):
+                print(f"{ruta}: no existe, se omite")
+                continue
+            if os.path.realpath(ruta) == os.path.realpath(args.destino):
+                print(f"{ruta}: es la base destino, se omite")
+                continue
+            conteo = importador.importar(ruta)
+            total += conteo["leidas"]
+            print(f"{ruta}: {conteo['leidas']} leídas, {conteo['importadas']} importadas, "
+                  f"{conteo['duplicadas']} duplicadas, {conteo['descartadas']} descartadas "
+                  f"({conteo['leidas'] / max(conteo['segundos'], 1e-9):.0f} filas/s)")
+    finally:
+        # abrir() quitó los índices: se rehacen también si la importación se interrumpe
+        print("Reconstruyendo índices...")
+        importador.cerrar()
+    segundos = time.perf_counter() - inicio
+    print(f"Total: {total} filas en {segundos:.2f} s ({total / max(segundos, 1e-9):.0f} filas/s)")
+
+if __name__ == "__main__":
+    main()
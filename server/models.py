@@ -4,6 +4,8 @@ Implementa serialización y deserialización JSON para comunicación distribuida
 """
 
 import json
+import re
+import unicodedata
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 import uuid
@@ -86,17 +88,127 @@ class Satelite:
     def __str__(self) -> str:
         return f"Satélite({self.nombre}, {self.tipo}, {self.estado})"
 
+def validar_punto(lon: float, lat: float):
+    """Lanza ValueError si el punto cae fuera de lon -180..180 o lat -90..90"""
+    if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+        raise ValueError("Coordenadas fuera de rango (lon -180..180, lat -90..90)")
+
+def validar_bbox(bbox) -> List[float]:
+    """Convierte bbox a [min_lon, min_lat, max_lon, max_lat] en float; lanza ValueError si no es válida"""
+    if not isinstance(bbox, (list, tuple)) or len(bbox) != 4:
+        raise ValueError("La bbox debe ser [min_lon, min_lat, max_lon, max_lat]")
+    min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox)
+    validar_punto(min_lon, min_lat)
+    validar_punto(max_lon, max_lat)
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError("La bbox debe tener min_lon <= max_lon y min_lat <= max_lat")
+    return [min_lon, min_lat, max_lon, max_lat]
+
+class ZonaObservacion:
+    """Zona de observación: caja (bbox) o polígono en lon/lat, con texto descriptivo"""
+
+    def __init__(self, nombre: str = "", bbox: Optional[List[float]] = None,
+                 poligono: Optional[List[List[float]]] = None):
+        self.nombre = nombre
+        self.poligono = poligono
+        # bbox = [min_lon, min_lat, max_lon, max_lat]
+        if bbox is None and poligono:
+            try:
+                lons = [p[0] for p in poligono]
+                lats = [p[1] for p in poligono]
+            except (TypeError, IndexError, KeyError):
+                raise ValueError("Cada punto del polígono debe ser [lon, lat]")
+            bbox = [min(lons), min(lats), max(lons), max(lats)]
+        self.bbox = bbox
+
+    def validar(self) -> 'ZonaObservacion':
+        """Comprueba rangos y orden de las coordenadas; lanza ValueError si no son válidas"""
+        if self.poligono is not None:
+            if not isinstance(self.poligono, list) or len(self.poligono) < 3:
+                raise ValueError("El polígono debe tener al menos 3 puntos [lon, lat]")
+            for punto in self.poligono:
+                if not isinstance(punto, (list, tuple)) or len(punto) != 2:
+                    raise ValueError("Cada punto del polígono debe ser [lon, lat]")
+                validar_punto(float(punto[0]), float(punto[1]))
+        if self.bbox is not None:
+            self.bbox = validar_bbox(self.bbox)
+        return self
+
+    def intersecta(self, bbox: List[float]) -> bool:
+        """Indica si la caja de la zona se cruza con otra caja"""
+        if not self.bbox:
+            return False
+        return (self.bbox[0] <= bbox[2] and bbox[0] <= self.bbox[2] and
+                self.bbox[1] <= bbox[3] and bbox[1] <= self.bbox[3])
+
+    def contiene(self, lon: float, lat: float) -> bool:
+        """Indica si el punto cae dentro de la zona (ray casting para polígonos)"""
+        if not self.intersecta([lon, lat, lon, lat]):
+            return False
+        if not self.poligono:
+            return True
+        dentro = False
+        j = len(self.poligono) - 1
+        for i in range(len(self.poligono)):
+            xi, yi = self.poligono[i][0], self.poligono[i][1]
+            xj, yj = self.poligono[j][0], self.poligono[j][1]
+            if (yi > lat) != (yj > lat) and lon < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+                dentro = not dentro
+            j = i
+        return dentro
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializa la zona a diccionario para JSON"""
+        data = {"nombre": self.nombre}
+        if self.poligono:
+            data["poligono"] = self.poligono
+        elif self.bbox:
+            data["bbox"] = self.bbox
+        return data
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> 'ZonaObservacion':
+        """Deserializa diccionario a objeto ZonaObservacion"""
+        return ZonaObservacion(
+            nombre=data.get("nombre", ""),
+            bbox=data.get("bbox"),
+            poligono=data.get("poligono")
+        )
+
+    @staticmethod
+    def from_valor(valor) -> 'ZonaObservacion':
+        """Interpreta una zona recibida como diccionario, JSON o texto libre"""
+        if isinstance(valor, ZonaObservacion):
+            return valor
+        if isinstance(valor, str):
+            try:
+                valor = json.loads(valor)
+            except ValueError:
+                return ZonaObservacion(nombre=valor)
+        if isinstance(valor, dict):
+            return ZonaObservacion.from_dict(valor)
+        return ZonaObservacion(nombre=str(valor))
+
+    def __str__(self) -> str:
+        if self.poligono or self.bbox:
+            return json.dumps(self.to_dict(), ensure_ascii=False)
+        return self.nombre
+
 class Mision:
     """Modelo para representar misiones de observación"""
     
     def __init__(self, satelite_id: str, objetivo: str, zona_observacion: str, 
-                 duracion: str, estado: str = "planificada"):
+                 duracion: str, estado: str = "planificada",
+                 inicio: Optional[str] = None, fin: Optional[str] = None):
         self.id = str(uuid.uuid4())
         self.satelite_id = satelite_id
         self.objetivo = objetivo
         self.zona_observacion = zona_observacion
         self.duracion = duracion
         self.estado = estado
+        # Ventana de ejecución en formato ISO; opcional en misiones antiguas
+        self.inicio = inicio
+        self.fin = fin
         self.fecha_creacion = datetime.now().isoformat()
     
     def to_dict(self) -> Dict[str, Any]:
@@ -105,9 +217,13 @@ class Mision:
             "id": self.id,
             "satelite_id": self.satelite_id,
             "objetivo": self.objetivo,
-            "zona_observacion": self.zona_observacion,
+            "zona_observacion": (self.zona_observacion.to_dict()
+                                 if isinstance(self.zona_observacion, ZonaObservacion)
+                                 else self.zona_observacion),
             "duracion": self.duracion,
             "estado": self.estado,
+            "inicio": self.inicio,
+            "fin": self.fin,
             "fecha_creacion": self.fecha_creacion
         }
     
@@ -119,7 +235,9 @@ class Mision:
             objetivo=data["objetivo"],
             zona_observacion=data["zona_observacion"],
             duracion=data["duracion"],
-            estado=data.get("estado", "planificada")
+            estado=data.get("estado", "planificada"),
+            inicio=data.get("inicio"),
+            fin=data.get("fin")
         )
         mision.id = data.get("id", str(uuid.uuid4()))
         mision.fecha_creacion = data.get("fecha_creacion", datetime.now().isoformat())
@@ -174,6 +292,67 @@ def serialize_to_json(obj) -> str:
     else:
         return json.dumps(obj, ensure_ascii=False, indent=2)
 
+# Palabras clave (en minúsculas y sin tildes) con las que se deduce el tipo de un sensor
+# por su nombre; van de la más específica a la más general
+TIPOS_SENSOR = {
+    "sar": "SAR",
+    "lidar": "LiDAR",
+    "multiespectral": "Multiespectral",
+    "hiperespectral": "Hiperespectral",
+    "termico": "Térmico",
+    "infrarrojo": "Infrarrojo", "ir": "Infrarrojo",
+    "altimetro": "Altímetro",
+    "radiometro": "Radiómetro",
+    "espectrometro": "Espectrómetro",
+    "gnss": "GNSS", "gps": "GNSS",
+    "radar": "Radar",
+    "optico": "Óptico", "camara": "Óptico", "pancromatico": "Óptico",
+}
+
+def inferir_tipo_sensor(nombre: str) -> str:
+    """Tipo del sensor según las palabras de su nombre; si ninguna se reconoce, el nombre mismo"""
+    texto = unicodedata.normalize("NFKD", nombre.lower())
+    palabras = set(re.findall(r"\w+", "".join(c for c in texto if not unicodedata.combining(c))))
+    for clave, tipo in TIPOS_SENSOR.items():
+        if clave in palabras:
+            return tipo
+    return nombre
+
+def normalizar_tipo_sensor(tipo, nombre: str = "") -> str:
+    """Tipo canónico: el que trae el sensor o, si falta, el deducido del nombre, pasado por TIPOS_SENSOR.
+
+    Así "óptico", "OPTICO" y "Óptico" quedan iguales; COLLATE NOCASE solo
+    iguala mayúsculas ASCII.
+    """
+    return inferir_tipo_sensor(str(tipo or nombre or ""))
+
+def sensores_desde_texto(texto) -> List[Sensor]:
+    """Convierte el campo sensores recibido por el servidor en objetos Sensor.
+
+    Acepta una lista JSON de diccionarios o de nombres, o texto libre
+    separado por comas. Si un sensor no trae tipo se deduce del nombre; los
+    tipos conocidos se guardan en su forma canónica.
+    """
+    if not texto:
+        return []
+    if isinstance(texto, str):
+        try:
+            texto = json.loads(texto)
+        except ValueError:
+            texto = texto.split(",")
+    if not isinstance(texto, list):
+        texto = [texto]
+
+    sensores = []
+    for item in texto:
+        if isinstance(item, dict) and "nombre" in item:
+            tipo = normalizar_tipo_sensor(item.get("tipo"), str(item["nombre"]))
+            sensores.append(Sensor(item["nombre"], tipo, item.get("descripcion", "")))
+        elif str(item).strip():
+            nombre = str(item).strip()
+            sensores.append(Sensor(nombre, inferir_tipo_sensor(nombre)))
+    return sensores
+
 def deserialize_from_json(json_str: str, model_class=None):
     """Deserializa string JSON a objeto"""
     data = json.loads(json_str)
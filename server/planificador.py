@@ -0,0 +1,199 @@
+"""
+Control de admisión y planificación de solicitudes entre los sockets y la base.
+
+Las solicitudes se separan en dos colas acotadas (escritura y lectura). Un
+grupo fijo de trabajadores las atiende alternando entre clases según su peso
+y, dentro de cada clase, por turnos entre conexiones. Cada cliente tiene un
+token bucket por clase; si no hay tokens o la cola está llena la solicitud se
+rechaza enseguida con una sugerencia de reintento.
+"""
+
+import itertools
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Tuple
+
+class Ocupado(Exception):
+    """Solicitud rechazada por falta de capacidad; reintentar_en en segundos"""
+
+    def __init__(self, mensaje: str, reintentar_en: float):
+        super().__init__(mensaje)
+        self.reintentar_en = reintentar_en
+
+class TokenBucket:
+    """Limita a `tasa` solicitudes por segundo con ráfagas de hasta `capacidad`"""
+
+    def __init__(self, tasa: float, capacidad: float):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.tokens = capacidad
+        self.ultimo = time.monotonic()
+
+    def lleno(self, ahora: float) -> bool:
+        """Indica si el bucket ya se habría recargado por completo, o sea que se puede olvidar"""
+        return self.tokens + (ahora - self.ultimo) * self.tasa >= self.capacidad
+
+    def consumir(self) -> float:
+        """Toma un token y devuelve 0, o devuelve los segundos que faltan para el próximo"""
+        ahora = time.monotonic()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+        self.ultimo = ahora
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.tasa
+
+class Tarea:
+    def __init__(self, funcion: Callable):
+        self.funcion = funcion
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error = None
+        self.encolada = time.monotonic()
+
+class Planificador:
+    """Colas acotadas por clase, turnos ponderados entre clases y equitativos entre conexiones"""
+
+    def __init__(self, trabajadores: int = 4, max_conexiones: int = 128,
+                 capacidad: Dict[str, int] = None, pesos: Dict[str, int] = None,
+                 tasas: Dict[str, Tuple[float, float]] = None):
+        self.db_file = None
+        self.trabajadores = trabajadores
+        self.max_conexiones = max_conexiones
+        self.capacidad = capacidad or {"escritura": 256, "lectura": 64}
+        pesos = pesos or {"escritura": 3, "lectura": 1}
+        # (solicitudes por segundo, ráfaga) por cliente y clase
+        self.tasas = tasas or {"escritura": (200.0, 400.0), "lectura": (20.0, 40.0)}
+
+        self.cond = threading.Condition()
+        self.colas = {clase: OrderedDict() for clase in self.capacidad}  # conexión -> deque de tareas
+        self.pendientes = {clase: 0 for clase in self.capacidad}
+        self.turnos = [clase for clase, peso in pesos.items() for _ in range(peso)]
+        self.turno = 0
+        self.buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self.max_buckets = 10000
+        self.proxima_poda = 0.0
+        self.conexiones = set()
+        self.ids = itertools.count(1)
+
+        self.atendidas = {clase: 0 for clase in self.capacidad}
+        self.rechazadas = {"cola_llena": 0, "limite_tasa": 0, "conexiones": 0}
+        self.servicio = {clase: 0.0 for clase in self.capacidad}  # promedio móvil en segundos
+        self.espera = {clase: 0.0 for clase in self.capacidad}
+
+    def iniciar(self, db_file: str):
+        self.db_file = db_file
+        for _ in range(self.trabajadores):
+            threading.Thread(target=self.trabajar, daemon=True).start()
+
+    def abrir_conexion(self) -> int:
+        with self.cond:
+            if len(self.conexiones) >= self.max_conexiones:
+                self.rechazadas["conexiones"] += 1
+                raise Ocupado("Demasiadas conexiones", 1.0)
+            conexion = next(self.ids)
+            self.conexiones.add(conexion)
+            return conexion
+
+    def cerrar_conexion(self, conexion: int):
+        with self.cond:
+            self.conexiones.discard(conexion)
+
+    def estimar_espera(self, clase: str) -> float:
+        return max(0.1, round(self.pendientes[clase] * self.servicio[clase] / self.trabajadores, 3))
+
+    def podar_buckets(self):
+        """Olvida los buckets recargados del todo; como mucho una vez por segundo. Con self.cond tomado"""
+        ahora = time.monotonic()
+        if len(self.buckets) <= self.max_buckets or ahora < self.proxima_poda:
+            return
+        self.buckets = {k: b for k, b in self.buckets.items() if not b.lleno(ahora)}
+        self.proxima_poda = ahora + 1.0
+
+    def ejecutar(self, conexion: int, cliente: str, clase: str, funcion: Callable):
+        """Encola funcion(conn, cursor) y espera su resultado; lanza Ocupado si no se admite"""
+        with self.cond:
+            bucket = self.buckets.get((cliente, clase))
+            if bucket is None:
+                self.podar_buckets()
+                bucket = self.buckets[(cliente, clase)] = TokenBucket(*self.tasas[clase])
+            espera = bucket.consumir()
+            if espera:
+                self.rechazadas["limite_tasa"] += 1
+                raise Ocupado("Límite de solicitudes excedido", round(espera, 3))
+            if self.pendientes[clase] >= self.capacidad[clase]:
+                self.rechazadas["cola_llena"] += 1
+                raise Ocupado(f"Cola de {clase} llena", self.estimar_espera(clase))
+
+            tarea = Tarea(funcion)
+            self.colas[clase].setdefault(conexion, deque()).append(tarea)
+            self.pendientes[clase] += 1
+            self.cond.notify()
+
+        tarea.evento.wait()
+        if tarea.error is not None:
+            raise tarea.error
+        return tarea.resultado
+
+    def siguiente(self):
+        """Elige la próxima tarea; se llama con self.cond tomado"""
+        for i in range(len(self.turnos)):
+            clase = self.turnos[(self.turno + i) % len(self.turnos)]
+            cola = self.colas[clase]
+            if not cola:
+                continue
+            self.turno = (self.turno + i + 1) % len(self.turnos)
+            conexion, tareas = next(iter(cola.items()))
+            tarea = tareas.popleft()
+            if tareas:
+                cola.move_to_end(conexion)
+            else:
+                del cola[conexion]
+            self.pendientes[clase] -= 1
+            return clase, tarea
+        return None
+
+    def trabajar(self):
+        conn = sqlite3.connect(self.db_file)
+        cursor = conn.cursor()
+        while True:
+            with self.cond:
+                siguiente = self.siguiente()
+                while siguiente is None:
+                    self.cond.wait()
+                    siguiente = self.siguiente()
+            clase, tarea = siguiente
+
+            inicio = time.monotonic()
+            try:
+                tarea.resultado = tarea.funcion(conn, cursor)
+            except Exception as e:
+                conn.rollback()
+                tarea.error = e
+            fin = time.monotonic()
+
+            with self.cond:
+                self.atendidas[clase] += 1
+                self.servicio[clase] = 0.9 * self.servicio[clase] + 0.1 * (fin - inicio)
+                self.espera[clase] = 0.9 * self.espera[clase] + 0.1 * (inicio - tarea.encolada)
+            tarea.evento.set()
+
+    def metricas(self) -> Dict:
+        with self.cond:
+            return {
+                "colas": {
+                    clase: {
+                        "pendientes": self.pendientes[clase],
+                        "capacidad": self.capacidad[clase],
+                        "atendidas": self.atendidas[clase],
+                        "servicio_medio": self.servicio[clase],
+                        "espera_media": self.espera[clase],
+                    }
+                    for clase in self.capacidad
+                },
+                "rechazadas": dict(self.rechazadas),
+                "conexiones": len(self.conexiones),
+                "trabajadores": self.trabajadores,
+            }
@@ -1,12 +1,153 @@
 # server.py
+import contextlib
 import socket
 import threading
 import json
 import sqlite3
+import sys
+import time
+from models import ZonaObservacion, normalizar_tipo_sensor, sensores_desde_texto, validar_bbox, validar_punto
+from zonas import IndiceZonas
+from agenda import Agenda, ventana_mision
+from busqueda import Buscador
+from analisis import MOTOR, analizar, cargar_series, validar_percentiles, validar_textos
+from snapshots import crear_snapshot
+from planificador import Ocupado, Planificador
+from compresion import (ESTADISTICAS, comprimir_valor, descomprimir_valor, elegir_algoritmo, empaquetar,
+                        recibir_trama)
 
 DB_FILE = "sistema_satelites.db"
 DATABASE_LOCK = threading.Lock()
 
+# Snapshots con la API de backup: no toman DATABASE_LOCK, solo se serializan entre sí
+SNAPSHOT_LOCK = threading.Lock()
+SNAPSHOT_INTERVALO = 3600  # segundos entre snapshots automáticos; 0 los desactiva
+
+# Acciones que van a la cola de escritura; el resto va a la de lectura
+ESCRITURAS = {"registrar_satelite", "registrar_mision", "registrar_dato"}
+PLANIFICADOR = Planificador()
+
+# Compresión: respuestas mayores a UMBRAL_TRAMA bytes en conexiones que la negociaron,
+# y valores de datos mayores a VALOR_COMPRESION_UMBRAL bytes (0 la desactiva)
+UMBRAL_TRAMA = 1024
+VALOR_COMPRESION_UMBRAL = 1024
+
+# Caché en memoria nombre -> id de satélite. Se carga al iniciar y se
+# actualiza en cada registro con DATABASE_LOCK tomado; las consultas sueltas
+# con dict.get son atómicas y no lo necesitan.
+SATELITES_CACHE = {}
+
+# Índice espacial de las zonas de las misiones (R*Tree o grilla en memoria)
+ZONAS = IndiceZonas()
+
+# Ventanas de tiempo de las misiones por satélite, para detectar solapamientos
+AGENDA = Agenda()
+
+# Búsqueda de texto sobre misiones y satélites (FTS5 o índice invertido en memoria)
+BUSCADOR = Buscador()
+
+def cargar_cache_satelites(cursor):
+    SATELITES_CACHE.clear()
+    for satelite_id, nombre in cursor.execute("SELECT id, nombre FROM satelites").fetchall():
+        SATELITES_CACHE[sys.intern(nombre)] = satelite_id
+
+def obtener_satelite_id(nombre):
+    """Devuelve el id del satélite o None si no existe, sin consultar SQL"""
+    return SATELITES_CACHE.get(nombre)
+
+def columnas(cursor, tabla):
+    return [fila[1] for fila in cursor.execute(f"PRAGMA table_info({tabla})").fetchall()]
+
+def agregar_columna(cursor, tabla, columna, tipo):
+    if columna not in columnas(cursor, tabla):
+        cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo}")
+
+# Migrar misiones y datos de satelite_nombre TEXT a satelite_id INTEGER.
+# sqlite3 no abre transacción antes del DDL, así que la reconstrucción va
+# entre BEGIN y COMMIT explícitos para que un fallo no deje tablas a medias.
+def migrar_claves_satelite(cursor):
+    tablas = [tabla for tabla in ("misiones", "datos") if "satelite_nombre" in columnas(cursor, tabla)]
+    if not tablas:
+        return
+
+    conn = cursor.connection
+    conn.commit()
+    cursor.execute("BEGIN")
+    try:
+        if "misiones" in tablas:
+            cursor.execute("DROP TABLE IF EXISTS misiones_nueva")
+            cursor.execute('''
+                CREATE TABLE misiones_nueva (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    satelite_id INTEGER,
+                    objetivo TEXT,
+                    zona TEXT,
+                    duracion INTEGER,
+                    estado TEXT,
+                    FOREIGN KEY (satelite_id) REFERENCES satelites(id)
+                )
+            ''')
+            cursor.execute('''
+                INSERT INTO misiones_nueva (id,satelite_id,objetivo,zona,duracion,estado)
+                SELECT m.id, s.id, m.objetivo, m.zona, m.duracion, m.estado
+                FROM misiones m LEFT JOIN satelites s ON s.nombre = m.satelite_nombre
+            ''')
+            cursor.execute("DROP TABLE misiones")
+            cursor.execute("ALTER TABLE misiones_nueva RENAME TO misiones")
+
+        if "datos" in tablas:
+            cursor.execute("DROP TABLE IF EXISTS datos_nueva")
+            cursor.execute('''
+                CREATE TABLE datos_nueva (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    satelite_id INTEGER,
+                    tipo TEXT,
+                    valor TEXT,
+                    fecha TEXT,
+                    FOREIGN KEY (satelite_id) REFERENCES satelites(id)
+                )
+            ''')
+            cursor.execute('''
+                INSERT INTO datos_nueva (id,satelite_id,tipo,valor,fecha)
+                SELECT d.id, s.id, d.tipo, d.valor, d.fecha
+                FROM datos d LEFT JOIN satelites s ON s.nombre = d.satelite_nombre
+            ''')
+            cursor.execute("DROP TABLE datos")
+            cursor.execute("ALTER TABLE datos_nueva RENAME TO datos")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+# Guardar en la tabla sensores los sensores declarados por un satélite
+def registrar_sensores(cursor, satelite_id, sensores):
+    cursor.executemany(
+        "INSERT INTO sensores (satelite_id,nombre,tipo,descripcion) VALUES (?,?,?,?)",
+        [(satelite_id, sensor.nombre, sensor.tipo, sensor.descripcion) for sensor in sensores_desde_texto(sensores)]
+    )
+
+# Llenar la tabla sensores a partir de la columna de texto de satélites anteriores
+def migrar_sensores(cursor):
+    cursor.execute('''
+        SELECT id, sensores FROM satelites s
+        WHERE NOT EXISTS (SELECT 1 FROM sensores se WHERE se.satelite_id = s.id)
+    ''')
+    for satelite_id, sensores in cursor.fetchall():
+        registrar_sensores(cursor, satelite_id, sensores)
+
+    # Sensores guardados sin tipo o con un tipo conocido escrito de otra forma ("óptico", "OPTICO")
+    cursor.execute("SELECT id, nombre, tipo FROM sensores")
+    cursor.executemany("UPDATE sensores SET tipo = ? WHERE id = ?", [
+        (normalizar_tipo_sensor(tipo, nombre), sensor_id) for sensor_id, nombre, tipo in cursor.fetchall()
+        if normalizar_tipo_sensor(tipo, nombre) != tipo
+    ])
+
+# Guardar aparte el nombre descriptivo de las zonas, que es lo que indexa la búsqueda de texto
+def completar_zona_nombre(cursor):
+    cursor.execute("SELECT id, zona FROM misiones WHERE zona_nombre IS NULL AND zona IS NOT NULL")
+    cursor.executemany("UPDATE misiones SET zona_nombre = ? WHERE id = ?",
+                       [(ZonaObservacion.from_valor(zona).nombre, mision_id) for mision_id, zona in cursor.fetchall()])
+
 # Inicializar la base de datos y crear tablas si no existen
 def init_db():
     conn = sqlite3.connect(DB_FILE)
@@ -29,12 +170,14 @@ def init_db():
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS misiones (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            satelite_nombre TEXT,
+            satelite_id INTEGER,
             objetivo TEXT,
             zona TEXT,
             duracion INTEGER,
             estado TEXT,
-            FOREIGN KEY (satelite_nombre) REFERENCES satelites(nombre)
+            inicio TEXT,
+            fin TEXT,
+            FOREIGN KEY (satelite_id) REFERENCES satelites(id)
         )
     ''')
 
@@ -42,108 +185,332 @@ def init_db():
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS datos (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            satelite_nombre TEXT,
+            satelite_id INTEGER,
             tipo TEXT,
             valor TEXT,
             fecha TEXT,
-            FOREIGN KEY (satelite_nombre) REFERENCES satelites(nombre)
+            FOREIGN KEY (satelite_id) REFERENCES satelites(id)
+        )
+    ''')
+
+    # Tabla sensores
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sensores (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            satelite_id INTEGER,
+            nombre TEXT COLLATE NOCASE,
+            tipo TEXT COLLATE NOCASE,
+            descripcion TEXT,
+            FOREIGN KEY (satelite_id) REFERENCES satelites(id)
         )
     ''')
 
+    migrar_claves_satelite(cursor)
+    migrar_sensores(cursor)
+    agregar_columna(cursor, "misiones", "inicio", "TEXT")
+    agregar_columna(cursor, "misiones", "fin", "TEXT")
+    agregar_columna(cursor, "misiones", "zona_nombre", "TEXT")
+    completar_zona_nombre(cursor)
+    conn.commit()
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_misiones_satelite ON misiones(satelite_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_datos_satelite ON datos(satelite_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sensores_satelite ON sensores(satelite_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sensores_tipo ON sensores(tipo, satelite_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sensores_nombre ON sensores(nombre, satelite_id)")
+    cargar_cache_satelites(cursor)
+    ZONAS.inicializar(cursor)
+    AGENDA.cargar(cursor)
+    BUSCADOR.inicializar(cursor)
+
     conn.commit()
     conn.close()
 
-def handle_client(client_socket):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+# Las lecturas siguen devolviendo el nombre del satélite en la segunda columna
+SELECT_MISIONES = """
+    SELECT m.id, s.nombre, m.objetivo, m.zona, m.duracion, m.estado, m.inicio, m.fin
+    FROM misiones m LEFT JOIN satelites s ON s.id = m.satelite_id
+"""
+SELECT_DATOS = """
+    SELECT d.id, s.nombre, d.tipo, d.valor, d.fecha
+    FROM datos d LEFT JOIN satelites s ON s.id = d.satelite_id
+"""
 
-    while True:
-        try:
-            request = client_socket.recv(4096)
-            if not request:
-                break
+SELECT_SENSORES = """
+    SELECT se.id, s.nombre, se.nombre, se.tipo, se.descripcion, s.estado
+    FROM sensores se JOIN satelites s ON s.id = se.satelite_id
+"""
 
-            data = json.loads(request.decode())
-            accion = data.get("accion")
-            response = {"status": "error", "message": "Acción no reconocida"}
+def filas_datos(cursor):
+    """Filas de SELECT_DATOS con el valor ya descomprimido"""
+    return [fila[:3] + (descomprimir_valor(fila[3]),) + fila[4:] for fila in cursor.fetchall()]
 
-            if accion == "registrar_satelite":
-                with DATABASE_LOCK:
-                    try:
-                        cursor.execute(
-                            "INSERT INTO satelites (nombre,tipo,sensores,fecha_lanzamiento,orbita,estado) VALUES (?,?,?,?,?,?)",
-                            (data["nombre"], data["tipo"], data["sensores"], data["fecha_lanzamiento"], data["orbita"], data["estado"])
-                        )
-                        conn.commit()
-                        response = {"status": "success", "message": "Satélite registrado"}
-                    except sqlite3.IntegrityError:
-                        response = {"status": "error", "message": "El satélite ya existe"}
-
-            elif accion == "consultar_satelites":
-                with DATABASE_LOCK:
-                    cursor.execute("SELECT * FROM satelites")
-                    satelites = cursor.fetchall()
-                    response = {"status": "success", "data": {"satelites": satelites}}
-
-            elif accion == "registrar_mision":
-                with DATABASE_LOCK:
-                    cursor.execute("SELECT * FROM satelites WHERE nombre=?", (data["satelite_nombre"],))
-                    if cursor.fetchone():
-                        cursor.execute(
-                            "INSERT INTO misiones (satelite_nombre,objetivo,zona,duracion,estado) VALUES (?,?,?,?,?)",
-                            (data["satelite_nombre"], data["objetivo"], data["zona"], data["duracion"], data["estado"])
-                        )
-                        conn.commit()
-                        response = {"status": "success", "message": "Misión registrada"}
-                    else:
-                        response = {"status": "error", "message": "Satélite no encontrado"}
-
-            elif accion == "consultar_misiones":
-                with DATABASE_LOCK:
-                    cursor.execute("SELECT * FROM misiones")
-                    misiones = cursor.fetchall()
-                    response = {"status": "success", "data": {"misiones": misiones}}
-
-            elif accion == "registrar_dato":
-                with DATABASE_LOCK:
-                    cursor.execute("SELECT * FROM satelites WHERE nombre=?", (data["satelite_nombre"],))
-                    if cursor.fetchone():
-                        cursor.execute(
-                            "INSERT INTO datos (satelite_nombre,tipo,valor,fecha) VALUES (?,?,?,?)",
-                            (data["satelite_nombre"], data["tipo"], data["valor"], data["fecha"])
-                        )
-                        conn.commit()
-                        response = {"status": "success", "message": "Dato registrado"}
-                    else:
-                        response = {"status": "error", "message": "Satélite no encontrado"}
-
-            elif accion == "consultar_datos":
-                with DATABASE_LOCK:
-                    cursor.execute("SELECT * FROM datos")
-                    datos = cursor.fetchall()
-                    response = {"status": "success", "data": {"datos": datos}}
-
-            # Guardar backup
-            with DATABASE_LOCK:
-                cursor.execute("SELECT * FROM satelites")
-                satelites = cursor.fetchall()
-                cursor.execute("SELECT * FROM misiones")
+def consulta_sensores(data):
+    """Arma la consulta de sensores filtrando por tipo, nombre y estado del satélite"""
+    condiciones, parametros = [], []
+    for campo, columna in (("tipo", "se.tipo"), ("nombre", "se.nombre"), ("estado", "s.estado")):
+        if data.get(campo) is not None:
+            condiciones.append(f"{columna} = ?")
+            parametros.append(normalizar_tipo_sensor(data[campo]) if campo == "tipo" else data[campo])
+    if condiciones:
+        return SELECT_SENSORES + " WHERE " + " AND ".join(condiciones), parametros
+    return SELECT_SENSORES, parametros
+
+def consulta_misiones_por_id(ids):
+    marcas = ",".join("?" * len(ids))
+    return SELECT_MISIONES + f" WHERE m.id IN ({marcas}) ORDER BY m.id", list(ids)
+
+def consulta_por_satelite(select, alias, satelite_nombre):
+    """Agrega el filtro opcional por nombre de satélite, resuelto a id con la caché"""
+    if satelite_nombre is None:
+        return select, ()
+    return select + f" WHERE {alias}.satelite_id = ?", (obtener_satelite_id(satelite_nombre),)
+
+def estructura_compartida(en_memoria):
+    """DATABASE_LOCK si el índice vive en memoria (grilla, índice invertido); con SQLite no hace falta"""
+    return DATABASE_LOCK if en_memoria else contextlib.nullcontext()
+
+def guardar_backup(cursor):
+    cursor.execute("SELECT * FROM satelites")
+    satelites = cursor.fetchall()
+    cursor.execute(SELECT_MISIONES)
+    misiones = cursor.fetchall()
+    cursor.execute(SELECT_DATOS)
+    datos = filas_datos(cursor)
+    with open("backup.json", "w") as f:
+        json.dump({"satelites": satelites, "misiones": misiones, "datos": datos}, f, indent=4)
+
+def procesar(data, conn, cursor):
+    """Ejecuta una acción contra la base; lo llaman los trabajadores del planificador.
+
+    Cada trabajador tiene su propia conexión, así que las lecturas corren en
+    paralelo y SQLite serializa las escrituras. DATABASE_LOCK solo protege las
+    estructuras en memoria compartidas: la caché de satélites, AGENDA y los
+    índices de respaldo de ZONAS y BUSCADOR.
+    """
+    accion = data.get("accion")
+    response = {"status": "error", "message": "Acción no reconocida"}
+
+    if accion == "registrar_satelite":
+        with DATABASE_LOCK:
+            try:
+                sensores = data["sensores"]
+                if not isinstance(sensores, str):
+                    sensores = json.dumps(sensores)
+                cursor.execute(
+                    "INSERT INTO satelites (nombre,tipo,sensores,fecha_lanzamiento,orbita,estado) VALUES (?,?,?,?,?,?)",
+                    (data["nombre"], data["tipo"], sensores, data["fecha_lanzamiento"], data["orbita"], data["estado"])
+                )
+                satelite_id = cursor.lastrowid
+                registrar_sensores(cursor, satelite_id, sensores)
+                conn.commit()
+                SATELITES_CACHE[sys.intern(data["nombre"])] = satelite_id
+                BUSCADOR.agregar("satelite", satelite_id, data["nombre"], data["tipo"])
+                response = {"status": "success", "message": "Satélite registrado"}
+            except sqlite3.IntegrityError:
+                response = {"status": "error", "message": "El satélite ya existe"}
+
+    elif accion == "consultar_satelites":
+        cursor.execute("SELECT * FROM satelites")
+        satelites = cursor.fetchall()
+        response = {"status": "success", "data": {"satelites": satelites}}
+
+    elif accion == "consultar_sensores":
+        cursor.execute(*consulta_sensores(data))
+        sensores = cursor.fetchall()
+        response = {"status": "success", "data": {"sensores": sensores}}
+
+    elif accion == "registrar_mision":
+        # La verificación de solapamiento y el alta en AGENDA tienen que ser atómicas
+        with DATABASE_LOCK:
+            satelite_id = obtener_satelite_id(data["satelite_nombre"])
+            if satelite_id is None:
+                response = {"status": "error", "message": "Satélite no encontrado"}
+            else:
+                inicio, fin = ventana_mision(data.get("inicio"), data.get("fin"), data["duracion"])
+                solapadas = AGENDA.solapadas(satelite_id, inicio, fin) if inicio else []
+                if solapadas and data.get("solapamiento", "rechazar") != "marcar":
+                    response = {"status": "error", "message": "La misión se solapa con otras del satélite",
+                                "data": {"solapadas": solapadas}}
+                else:
+                    zona = ZonaObservacion.from_valor(data["zona"]).validar()
+                    cursor.execute(
+                        "INSERT INTO misiones (satelite_id,objetivo,zona,duracion,estado,inicio,fin,zona_nombre) VALUES (?,?,?,?,?,?,?,?)",
+                        (satelite_id, data["objetivo"], str(zona), data["duracion"], data["estado"], inicio, fin, zona.nombre)
+                    )
+                    mision_id = cursor.lastrowid
+                    ZONAS.agregar(cursor, mision_id, zona)
+                    conn.commit()
+                    if inicio:
+                        AGENDA.agregar(satelite_id, mision_id, inicio, fin)
+                    BUSCADOR.agregar("mision", mision_id, data["objetivo"], zona.nombre)
+                    response = {"status": "success", "message": "Misión registrada"}
+                    if solapadas:
+                        response["message"] = "Misión registrada con solapamiento"
+                        response["data"] = {"solapadas": solapadas}
+
+    elif accion == "consultar_misiones":
+        cursor.execute(*consulta_por_satelite(SELECT_MISIONES, "m", data.get("satelite_nombre")))
+        misiones = cursor.fetchall()
+        response = {"status": "success", "data": {"misiones": misiones}}
+
+    elif accion == "consultar_misiones_zona":
+        with estructura_compartida(ZONAS.grilla is not None):
+            if "punto" in data:
+                lon, lat = (float(v) for v in data["punto"])
+                validar_punto(lon, lat)
+                ids = ZONAS.buscar_punto(cursor, lon, lat)
+            elif "bbox" in data:
+                ids = ZONAS.buscar_bbox(cursor, validar_bbox(data["bbox"]))
+            else:
+                ids = None
+
+        if ids is None:
+            response = {"status": "error", "message": "Se requiere 'bbox' o 'punto'"}
+        else:
+            misiones = []
+            if ids:
+                cursor.execute(*consulta_misiones_por_id(ids))
                 misiones = cursor.fetchall()
-                cursor.execute("SELECT * FROM datos")
-                datos = cursor.fetchall()
-                with open("backup.json", "w") as f:
-                    json.dump({"satelites": satelites, "misiones": misiones, "datos": datos}, f, indent=4)
+            response = {"status": "success", "data": {"misiones": misiones}}
 
-            client_socket.send(json.dumps(response).encode())
+    elif accion == "consultar_misiones_activas":
+        with DATABASE_LOCK:
+            satelite_id = None
+            if data.get("satelite_nombre") is not None:
+                satelite_id = obtener_satelite_id(data["satelite_nombre"])
+            if data.get("satelite_nombre") is not None and satelite_id is None:
+                ids = []
+            else:
+                ids = AGENDA.activas(data["desde"], data.get("hasta"), satelite_id)
+        misiones = []
+        if ids:
+            cursor.execute(*consulta_misiones_por_id(ids))
+            misiones = cursor.fetchall()
+        response = {"status": "success", "data": {"misiones": misiones}}
 
-        except Exception as e:
-            client_socket.send(json.dumps({"status": "error", "message": str(e)}).encode())
+    elif accion == "buscar":
+        limite = max(1, min(int(data.get("limite", 20)), 100))
+        pagina = max(int(data.get("pagina", 1)), 1)
+        with estructura_compartida(BUSCADOR.indice is not None):
+            resultados = BUSCADOR.buscar(cursor, data["texto"], data.get("en"), limite, (pagina - 1) * limite)
+        response = {"status": "success", "data": {"resultados": resultados, "pagina": pagina, "limite": limite}}
 
-    conn.close()
-    client_socket.close()
+    elif accion == "registrar_dato":
+        satelite_id = obtener_satelite_id(data["satelite_nombre"])
+        if satelite_id is not None:
+            cursor.execute(
+                "INSERT INTO datos (satelite_id,tipo,valor,fecha) VALUES (?,?,?,?)",
+                (satelite_id, data["tipo"], comprimir_valor(data["valor"], VALOR_COMPRESION_UMBRAL), data["fecha"])
+            )
+            conn.commit()
+            response = {"status": "success", "message": "Dato registrado"}
+        else:
+            response = {"status": "error", "message": "Satélite no encontrado"}
+
+    elif accion == "consultar_datos":
+        cursor.execute(*consulta_por_satelite(SELECT_DATOS, "d", data.get("satelite_nombre")))
+        datos = filas_datos(cursor)
+        response = {"status": "success", "data": {"datos": datos}}
+
+    elif accion == "analizar_datos":
+        percentiles = validar_percentiles(data.get("percentiles", [50, 90, 99]))
+        satelites = validar_textos(data.get("satelites"), "satelites")
+        tipos = validar_textos(data.get("tipos"), "tipos")
+        with DATABASE_LOCK:
+            satelite_ids = None
+            if satelites is not None:
+                satelite_ids = [obtener_satelite_id(nombre) for nombre in satelites]
+                satelite_ids = [i for i in satelite_ids if i is not None]
+            nombres = {satelite_id: nombre for nombre, satelite_id in SATELITES_CACHE.items()}
+        series = cargar_series(cursor, satelite_ids, tipos, data.get("intervalo"))
+        grupos = analizar(series, percentiles, float(data.get("umbral_z", 3.0)))
+        for grupo in grupos:
+            grupo["satelite"] = nombres.get(grupo.pop("satelite_id"))
+        response = {"status": "success", "data": {"grupos": grupos, "motor": MOTOR}}
+
+    elif accion == "snapshot":
+        with SNAPSHOT_LOCK:
+            resultado = crear_snapshot(DB_FILE, comprimir=bool(data.get("comprimir", False)))
+        response = {"status": "success", "message": "Snapshot creado", "data": resultado}
+
+    # Guardar backup solo cuando una escritura cambió la base; el lock evita que dos
+    # trabajadores escriban backup.json a la vez
+    if accion in ESCRITURAS and response["status"] == "success":
+        with DATABASE_LOCK:
+            guardar_backup(cursor)
+
+    return response
+
+def enviar_respuesta(client_socket, response, accion, algoritmo):
+    carga = json.dumps(response).encode()
+    if algoritmo is None:
+        client_socket.send(carga)
+    else:
+        client_socket.sendall(empaquetar(carga, algoritmo, UMBRAL_TRAMA, accion))
+
+def handle_client(client_socket, addr, conexion):
+    # Algoritmo negociado por la conexión; hasta entonces solicitudes y respuestas van sin tramas
+    algoritmo = None
+    try:
+        while True:
+            accion = None
+            try:
+                if algoritmo is None:
+                    request = client_socket.recv(4096)
+                else:
+                    try:
+                        request = recibir_trama(client_socket)
+                    except ValueError as e:
+                        # Tras una trama inválida el flujo queda desalineado: se responde y se cierra
+                        enviar_respuesta(client_socket, {"status": "error", "message": str(e)}, accion, algoritmo)
+                        break
+                if not request:
+                    break
+
+                data = json.loads(request.decode())
+                accion = data.get("accion")
+                if accion == "negociar_compresion":
+                    response = {"status": "success", "data": {"algoritmo": elegir_algoritmo(data.get("algoritmos")),
+                                                              "umbral": UMBRAL_TRAMA}}
+                    client_socket.send(json.dumps(response).encode())
+                    algoritmo = response["data"]["algoritmo"]
+                    continue
+                if accion == "metricas":
+                    response = {"status": "success", "data": dict(PLANIFICADOR.metricas(), compresion=ESTADISTICAS.metricas())}
+                else:
+                    clase = "escritura" if accion in ESCRITURAS else "lectura"
+                    response = PLANIFICADOR.ejecutar(conexion, addr[0], clase,
+                                                     lambda conn, cursor: procesar(data, conn, cursor))
+
+                enviar_respuesta(client_socket, response, accion, algoritmo)
+
+            except Ocupado as e:
+                enviar_respuesta(client_socket, {"status": "busy", "message": str(e), "retry_after": e.reintentar_en},
+                                 accion, algoritmo)
+            except Exception as e:
+                enviar_respuesta(client_socket, {"status": "error", "message": str(e)}, accion, algoritmo)
+    except OSError:
+        pass  # el cliente cortó la conexión
+    finally:
+        # El lugar de la conexión se libera aunque el cliente se desconecte a mitad de una respuesta
+        PLANIFICADOR.cerrar_conexion(conexion)
+        client_socket.close()
+
+def snapshots_periodicos():
+    while True:
+        time.sleep(SNAPSHOT_INTERVALO)
+        try:
+            with SNAPSHOT_LOCK:
+                resultado = crear_snapshot(DB_FILE, comprimir=True)
+            print(f"Snapshot automático: {resultado['archivo']}")
+        except Exception as e:
+            print(f"Error creando snapshot: {e}")
 
 def main():
     init_db()
+    PLANIFICADOR.iniciar(DB_FILE)
+    if SNAPSHOT_INTERVALO:
+        threading.Thread(target=snapshots_periodicos, daemon=True).start()
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server.bind(("0.0.0.0", 12345))
     server.listen(5)
@@ -152,7 +519,17 @@ def main():
     while True:
         client_socket, addr = server.accept()
         print(f"Conexión de {addr}")
-        threading.Thread(target=handle_client, args=(client_socket,), daemon=True).start()
+        # La admisión se decide antes de crear el hilo: como mucho max_conexiones hilos de clientes
+        try:
+            conexion = PLANIFICADOR.abrir_conexion()
+        except Ocupado as e:
+            try:
+                client_socket.send(json.dumps({"status": "busy", "message": str(e), "retry_after": e.reintentar_en}).encode())
+            except OSError:
+                pass
+            client_socket.close()
+            continue
+        threading.Thread(target=handle_client, args=(client_socket, addr, conexion), daemon=True).start()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,167 @@
+"""
+Snapshots de la base con la API de backup de SQLite.
+
+La copia avanza por bloques de páginas y libera la base entre bloques, así
+los demás clientes pueden seguir escribiendo; si las escrituras la reinician
+una y otra vez, se completa en una sola pasada. Los archivos se rotan y se
+pueden comprimir con gzip. La restauración copia el snapshot completo sobre
+la base del servidor (que debe estar detenido).
+
+Uso:
+    python server/snapshots.py crear [--comprimir]
+    python server/snapshots.py listar
+    python server/snapshots.py restaurar snapshots/satelites-20250101-120000.db.gz
+"""
+
+import argparse
+import glob
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+DIRECTORIO = "snapshots"
+PREFIJO = "satelites-"
+
+def listar_snapshots(directorio: str = DIRECTORIO) -> List[str]:
+    """Snapshots existentes, del más viejo al más nuevo"""
+    return sorted(glob.glob(os.path.join(directorio, PREFIJO + "*.db")) +
+                  glob.glob(os.path.join(directorio, PREFIJO + "*.db.gz")))
+
+def rotar(directorio: str = DIRECTORIO, conservar: int = 5):
+    """Borra los snapshots más viejos dejando solo los últimos `conservar` (al menos 1)"""
+    if conservar < 1:
+        raise ValueError("Hay que conservar al menos un snapshot")
+    for ruta in listar_snapshots(directorio)[:-conservar]:
+        os.remove(ruta)
+
+class CopiaReiniciada(Exception):
+    """La copia por pasos volvió a empezar demasiadas veces por escrituras concurrentes"""
+
+def vigilar_copia(pausa: float, max_reinicios: int):
+    """Callback de progreso para Connection.backup.
+
+    SQLite reinicia la copia desde la primera página cuando otra conexión
+    escribe en la base; si las páginas restantes no bajan después de un paso
+    se cuenta un reinicio y, pasados max_reinicios, se corta la copia. Entre
+    pasos espera `pausa` segundos para que los escritores avancen.
+    """
+    estado = {"restantes": None, "reinicios": 0}
+
+    def progreso(status, restantes, total):
+        if status != 0:  # SQLITE_OK; BUSY y LOCKED son esperas, no avances
+            return
+        if estado["restantes"] is not None and restantes >= estado["restantes"]:
+            estado["reinicios"] += 1
+            if estado["reinicios"] > max_reinicios:
+                raise CopiaReiniciada(f"La copia se reinició {estado['reinicios']} veces")
+        estado["restantes"] = restantes
+        if restantes and pausa:
+            time.sleep(pausa)
+
+    return progreso
+
+def crear_snapshot(db_file: str, directorio: str = DIRECTORIO, paginas: int = 1024, pausa: float = 0.05,
+                   comprimir: bool = False, conservar: int = 5, max_reinicios: int = 3) -> Dict:
+    """Copia la base en caliente y devuelve la ruta, el tamaño y los segundos que tardó.
+
+    Copia por bloques de `paginas`; si las escrituras la hacen reiniciar más de
+    max_reinicios veces, termina con una copia en una sola pasada.
+    """
+    if conservar < 1:
+        raise ValueError("Hay que conservar al menos un snapshot")
+    inicio = time.perf_counter()
+    os.makedirs(directorio, exist_ok=True)
+    nombre = PREFIJO + datetime.now().strftime("%Y%m%d-%H%M%S-%f") + ".db"
+    ruta = os.path.join(directorio, nombre)
+    temporal = ruta + ".tmp"
+    una_pasada = False
+
+    try:
+        origen = sqlite3.connect(db_file)
+        destino = sqlite3.connect(temporal)
+        try:
+            try:
+                origen.backup(destino, pages=paginas, progress=vigilar_copia(pausa, max_reinicios), sleep=pausa)
+            except CopiaReiniciada:
+                # Una sola pasada toma la base de lectura hasta terminar, así que no se reinicia
+                una_pasada = True
+                origen.backup(destino, pages=-1, sleep=pausa)
+        finally:
+            destino.close()
+            origen.close()
+
+        if comprimir:
+            ruta += ".gz"
+            with open(temporal, "rb") as entrada, gzip.open(ruta + ".tmp", "wb", compresslevel=6) as salida:
+                shutil.copyfileobj(entrada, salida, 1024 * 1024)
+            os.remove(temporal)
+            temporal = ruta + ".tmp"
+        os.replace(temporal, ruta)
+    except BaseException:
+        for sobrante in (temporal, ruta + ".tmp"):
+            if os.path.exists(sobrante):
+                os.remove(sobrante)
+        raise
+    rotar(directorio, conservar)
+
+    return {"archivo": ruta, "bytes": os.path.getsize(ruta), "segundos": time.perf_counter() - inicio,
+            "una_pasada": una_pasada}
+
+def restaurar_snapshot(ruta: str, db_file: str) -> Dict:
+    """Reemplaza el contenido de db_file por el del snapshot (con el servidor detenido)"""
+    inicio = time.perf_counter()
+    temporal = None
+    if ruta.endswith(".gz"):
+        descriptor, temporal = tempfile.mkstemp(suffix=".db")
+        with os.fdopen(descriptor, "wb") as salida, gzip.open(ruta, "rb") as entrada:
+            shutil.copyfileobj(entrada, salida, 1024 * 1024)
+        ruta = temporal
+
+    origen = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+    destino = sqlite3.connect(db_file)
+    try:
+        origen.backup(destino)
+    finally:
+        destino.close()
+        origen.close()
+        if temporal:
+            os.remove(temporal)
+
+    return {"archivo": db_file, "bytes": os.path.getsize(db_file), "segundos": time.perf_counter() - inicio}
+
+def main():
+    import server
+
+    parser = argparse.ArgumentParser(description="Snapshots de la base del servidor")
+    parser.add_argument("comando", choices=["crear", "listar", "restaurar"])
+    parser.add_argument("snapshot", nargs="?", help="archivo a restaurar (por defecto, el último)")
+    parser.add_argument("--db", default=server.DB_FILE)
+    parser.add_argument("--directorio", default=DIRECTORIO)
+    parser.add_argument("--comprimir", action="store_true")
+    parser.add_argument("--conservar", type=int, default=5)
+    args = parser.parse_args()
+    if args.conservar < 1:
+        parser.error("--conservar debe ser al menos 1")
+
+    if args.comando == "crear":
+        resultado = crear_snapshot(args.db, args.directorio, comprimir=args.comprimir, conservar=args.conservar)
+        print(f"Snapshot {resultado['archivo']} ({resultado['bytes']} bytes) en {resultado['segundos']:.2f} s")
+    elif args.comando == "listar":
+        for ruta in listar_snapshots(args.directorio):
+            print(f"{ruta}  {os.path.getsize(ruta)} bytes")
+    else:
+        snapshots = listar_snapshots(args.directorio)
+        ruta = args.snapshot or (snapshots[-1] if snapshots else None)
+        if ruta is None:
+            print("No hay snapshots para restaurar")
+            return
+        resultado = restaurar_snapshot(ruta, args.db)
+        print(f"Restaurado {ruta} en {resultado['archivo']} en {resultado['segundos']:.2f} s")
+
+if __name__ == "__main__":
+    main()
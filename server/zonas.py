@@ -0,0 +1,107 @@
+"""
+Índice espacial de las zonas de observación de las misiones.
+Usa una tabla virtual R*Tree de SQLite y, si el módulo no está compilado,
+una grilla en memoria con el mismo comportamiento.
+"""
+
+import sqlite3
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+from models import ZonaObservacion
+
+class IndiceGrilla:
+    """Índice en memoria que reparte las cajas en celdas de tamaño fijo (grados)"""
+
+    def __init__(self, tam_celda: float = 5.0, max_celdas: int = 256):
+        self.tam_celda = tam_celda
+        self.max_celdas = max_celdas
+        self.celdas: Dict[tuple, Set[int]] = defaultdict(set)
+        self.grandes: Set[int] = set()  # zonas que ocupan demasiadas celdas
+        self.bboxes: Dict[int, List[float]] = {}
+
+    def _celdas(self, bbox: List[float]) -> Optional[List[tuple]]:
+        """Celdas que cubre la caja, recortada al rango lon/lat; None si son más de max_celdas"""
+        x0 = max(int(bbox[0] // self.tam_celda), int(-180 // self.tam_celda))
+        y0 = max(int(bbox[1] // self.tam_celda), int(-90 // self.tam_celda))
+        x1 = min(int(bbox[2] // self.tam_celda), int(180 // self.tam_celda))
+        y1 = min(int(bbox[3] // self.tam_celda), int(90 // self.tam_celda))
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > self.max_celdas:
+            return None
+        return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+    def agregar(self, mision_id: int, bbox: List[float]):
+        self.bboxes[mision_id] = bbox
+        celdas = self._celdas(bbox)
+        if celdas is None:
+            self.grandes.add(mision_id)
+            return
+        for celda in celdas:
+            self.celdas[celda].add(mision_id)
+
+    def buscar(self, bbox: List[float]) -> Set[int]:
+        celdas = self._celdas(bbox)
+        if celdas is None:
+            candidatos = set(self.bboxes)
+        else:
+            candidatos = set(self.grandes)
+            for celda in celdas:
+                candidatos.update(self.celdas.get(celda, ()))
+        return {
+            mision_id for mision_id in candidatos
+            if ZonaObservacion(bbox=self.bboxes[mision_id]).intersecta(bbox)
+        }
+
+class IndiceZonas:
+    """Índice de zonas por misión sobre R*Tree, o sobre IndiceGrilla como respaldo"""
+
+    def __init__(self):
+        self.grilla = None
+
+    def inicializar(self, cursor):
+        """Crea el índice y carga las zonas de las misiones existentes"""
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS misiones_zona
+                USING rtree(id, min_lon, max_lon, min_lat, max_lat)
+            ''')
+            cursor.execute("SELECT id, zona FROM misiones WHERE id NOT IN (SELECT id FROM misiones_zona)")
+        except sqlite3.OperationalError:
+            self.grilla = IndiceGrilla()
+            cursor.execute("SELECT id, zona FROM misiones")
+
+        for mision_id, zona in cursor.fetchall():
+            self.agregar(cursor, mision_id, ZonaObservacion.from_valor(zona))
+
+    def agregar(self, cursor, mision_id: int, zona: ZonaObservacion):
+        """Indexa la zona de una misión; las zonas solo de texto no se indexan"""
+        if not zona.bbox:
+            return
+        if self.grilla is not None:
+            self.grilla.agregar(mision_id, zona.bbox)
+        else:
+            cursor.execute(
+                "INSERT OR REPLACE INTO misiones_zona (id,min_lon,max_lon,min_lat,max_lat) VALUES (?,?,?,?,?)",
+                (mision_id, zona.bbox[0], zona.bbox[2], zona.bbox[1], zona.bbox[3])
+            )
+
+    def buscar_bbox(self, cursor, bbox: List[float]) -> List[int]:
+        """Ids de las misiones cuya caja se cruza con bbox = [min_lon, min_lat, max_lon, max_lat]"""
+        if self.grilla is not None:
+            return sorted(self.grilla.buscar(bbox))
+        cursor.execute(
+            "SELECT id FROM misiones_zona WHERE min_lon <= ? AND max_lon >= ? AND min_lat <= ? AND max_lat >= ? ORDER BY id",
+            (bbox[2], bbox[0], bbox[3], bbox[1])
+        )
+        return [fila[0] for fila in cursor.fetchall()]
+
+    def buscar_punto(self, cursor, lon: float, lat: float) -> List[int]:
+        """Ids de las misiones cuya zona contiene el punto"""
+        candidatos = self.buscar_bbox(cursor, [lon, lat, lon, lat])
+        if not candidatos:
+            return []
+        marcas = ",".join("?" * len(candidatos))
+        cursor.execute(f"SELECT id, zona FROM misiones WHERE id IN ({marcas}) ORDER BY id", candidatos)
+        return [
+            mision_id for mision_id, zona in cursor.fetchall()
+            if ZonaObservacion.from_valor(zona).contiene(lon, lat)
+        ]